@@ -0,0 +1,201 @@
+"""
+    Benchmarks the profile store against synthetic stores.
+
+    For every combination of store size and interval count it times
+    read_profiles (read_all for the other backends), load_profile,
+    save_profile, delete_profile and validate_reminder_types, and reports
+    latency percentiles and the peak memory allocated by each operation.
+
+    Run from the repository root:
+        python -m benchmarks.profile_store --profiles 10 1000 100000 --intervals 1 100 1000 \
+            --output results.json
+
+    Big combinations take a lot of memory and disk, e.g. 100k profiles with
+    1000 intervals each is a store of several gigabytes.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from standup import profiles
+
+from benchmarks.synthetic import make_profile, make_profiles
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(timings, peak_bytes):
+    return {
+        "count": len(timings),
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p90_ms": percentile(timings, 0.90) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "max_ms": max(timings) * 1000,
+        "peak_kib": peak_bytes / 1024,
+    }
+
+
+def measure(operation, repeat, setup=None):
+    """
+    Times operation repeat times, calling setup (untimed) before each run,
+    then runs it once more under tracemalloc to find its peak allocation.
+    """
+    timings = []
+    for _ in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    operation()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # The first run warms up imports and the OS file cache
+    return summarize(timings[1:], peak_bytes)
+
+
+def open_store(backend, directory):
+    json_filename = os.path.join(directory, "profiles.json")
+    if backend == profiles.SQLiteProfileStore.name:
+        return profiles.SQLiteProfileStore(
+            os.path.join(directory, "profiles.sqlite3"), json_filename
+        )
+    if backend == profiles.ShardedProfileStore.name:
+        return profiles.ShardedProfileStore(os.path.join(directory, "profiles"), json_filename)
+    return profiles.JSONProfileStore(json_filename)
+
+
+def store_size(directory):
+    total = 0
+    for root, _, files in os.walk(directory):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def run_case(backend, num_profiles, num_intervals, repeat, seed):
+    rng = random.Random(seed)
+    data = make_profiles(num_profiles, num_intervals, seed)
+    names = list(data)
+    with tempfile.TemporaryDirectory(prefix="standup-bench-") as directory:
+        profiles.write_profiles(data, os.path.join(directory, "profiles.json"))
+        store = open_store(backend, directory)
+        if backend != profiles.JSONProfileStore.name:
+            # Only the store being measured should count towards the size
+            json_filename = os.path.join(directory, "profiles.json")
+            for path in (json_filename, profiles.get_index_location(json_filename)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        def cold():
+            profiles.profile_cache.clear()
+
+        def pick():
+            return rng.choice(names)
+
+        result = {
+            "backend": backend,
+            "profiles": num_profiles,
+            "intervals": num_intervals,
+            "operations": {},
+        }
+        operations = result["operations"]
+        operations["read_profiles"] = measure(store.read_all, repeat, cold)
+        operations["load_profile"] = measure(lambda: store.load(pick()), repeat, cold)
+        operations["load_profile_cached"] = measure(
+            lambda: store.load(pick()), repeat, store.read_all
+        )
+        operations["save_profile"] = measure(
+            lambda: store.save(pick(), make_profile(rng, num_intervals)), repeat
+        )
+
+        deleted = []
+
+        def restore():
+            while deleted:
+                store.save(deleted.pop(), make_profile(rng, num_intervals))
+
+        def delete():
+            name = pick()
+            deleted.append(name)
+            store.delete(name)
+
+        operations["delete_profile"] = measure(delete, repeat, restore)
+        restore()
+        all_profiles = store.read_all()
+        operations["validate_reminder_types"] = measure(
+            lambda: profiles.validate_reminder_types(all_profiles), repeat
+        )
+        result["store_bytes"] = store_size(directory)
+        if hasattr(store, "close"):
+            store.close()
+    return result
+
+
+def peak_rss_kib():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / 1024 if sys.platform == "darwin" else peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", nargs="+", default=[profiles.JSONProfileStore.name],
+                        choices=list(profiles.profile_backends))
+    parser.add_argument("--profiles", nargs="+", type=int, default=[10, 1000, 10000])
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backend:
+        for num_profiles in args.profiles:
+            for num_intervals in args.intervals:
+                result = run_case(backend, num_profiles, num_intervals, args.repeat, args.seed)
+                results.append(result)
+                print(
+                    f"{backend} - {num_profiles} profiles x {num_intervals} intervals "
+                    f"({result['store_bytes'] / 1024:.0f} KiB)"
+                )
+                for operation, stats in result["operations"].items():
+                    print(
+                        f"  {operation:<24}p50 {stats['p50_ms']:>9.3f} ms"
+                        f"  p99 {stats['p99_ms']:>9.3f} ms"
+                        f"  peak {stats['peak_kib']:>10.1f} KiB"
+                    )
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "peak_rss_kib": peak_rss_kib(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent="  ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+    Times QProgressRing painting a whole interval offscreen.
+
+    For every combination of size, device pixel ratio and format the ring
+    counts through a 25 minute interval one second at a time, painting
+    into a QImage after every tick. It reports the mean and p99 paint time
+    per frame, the Python memory allocated per frame and the CPU time the
+    whole interval took. "dirty" repaints only QProgressRing.dirtyRegion()
+    like the app does, "full" the whole widget.
+
+    Every device pixel ratio runs in its own process, since Qt only takes
+    the scale factor (QT_SCALE_FACTOR) when it starts.
+
+    Run from the repository root:
+        python -m benchmarks.progress_ring --sizes 200 800 3840x2160 --dprs 1 2 \
+            --output results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_case(size, fmt, repaint, duration):
+    from PySide6 import QtCore, QtGui, QtWidgets
+
+    from standup.QProgressRing import QProgressRing
+
+    dpr = QtGui.QGuiApplication.primaryScreen().devicePixelRatio()
+    width, height = size
+    ring = QProgressRing()
+    ring.setFormat(fmt)
+    ring.setMinimum(0)
+    ring.setMaximum(duration)
+    ring.setValue(0)
+    # size is in device pixels
+    ring.resize(round(width / dpr), round(height / dpr))
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(dpr)
+    image.fill(QtCore.Qt.transparent)
+    QtWidgets.QWidget.render(ring, image)
+
+    def tick(value):
+        region = (
+            ring.dirtyRegion(value) if repaint == "dirty" else QtGui.QRegion(ring.rect())
+        )
+        ring.setValue(value)
+        QtWidgets.QWidget.render(ring, image, region.boundingRect().topLeft(), region)
+
+    timings = []
+    cpu_start = time.process_time()
+    for value in range(1, duration):
+        start = time.perf_counter()
+        tick(value)
+        timings.append(time.perf_counter() - start)
+    cpu_seconds = time.process_time() - cpu_start
+
+    # Again under tracemalloc, which slows everything down
+    ring.setValue(0)
+    allocated = 0
+    tracemalloc.start()
+    for value in range(1, duration):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        tick(value)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        "width": width,
+        "height": height,
+        "dpr": dpr,
+        "format": fmt,
+        "repaint": repaint,
+        "frames": len(timings),
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "alloc_bytes_per_frame": allocated / len(timings),
+        "cpu_ms": cpu_seconds * 1000,
+    }
+
+
+def run_worker(args):
+    """
+    Runs every case for the scale factor this process was started with
+    and writes the results to stdout as JSON Lines.
+    """
+    from PySide6 import QtWidgets
+
+    app = QtWidgets.QApplication([])
+    for size in args.sizes:
+        for fmt in args.formats:
+            for repaint in args.repaint:
+                result = run_case(parse_size(size), fmt, repaint, args.duration)
+                print(json.dumps(result), flush=True)
+    app.quit()
+
+
+def pyside_version():
+    import PySide6
+
+    return PySide6.__version__
+
+
+def run_dpr(dpr, argv):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", QT_SCALE_FACTOR=str(dpr))
+    # Measure the enum mode users get, not a compatibility one
+    env.pop("PYSIDE63_OPTION_PYTHON_ENUM", None)
+    worker = subprocess.run(
+        [sys.executable, "-m", "benchmarks.progress_ring", "--worker"] + argv,
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    if worker.returncode != 0:
+        sys.exit(f"The benchmark failed at device pixel ratio {dpr:g}, see the error above")
+    return [json.loads(line) for line in worker.stdout.splitlines() if line.startswith("{")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["200", "800", "1920x1080", "3840x2160"],
+                        help="Target sizes in device pixels, WIDTHxHEIGHT or one number for a square")
+    parser.add_argument("--dprs", nargs="+", type=float, default=[1, 2])
+    parser.add_argument("--formats", nargs="+", default=["%", "countdown"])
+    parser.add_argument("--repaint", nargs="+", default=["dirty", "full"], choices=["dirty", "full"])
+    parser.add_argument("--duration", type=int, default=25 * 60,
+                        help="Seconds in the interval, one frame each (default: 1500)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    case_args = ["--sizes", *args.sizes, "--formats", *args.formats,
+                 "--repaint", *args.repaint, "--duration", str(args.duration)]
+    results = []
+    print(f"{'size':>11}{'dpr':>5}  {'format':<10}{'repaint':<8}"
+          f"{'mean (ms)':>11}{'p99 (ms)':>10}{'alloc (B)':>11}{'cpu (ms)':>10}")
+    for dpr in args.dprs:
+        for result in run_dpr(dpr, case_args):
+            results.append(result)
+            print(
+                f"{result['width']:>5}x{result['height']:<5}{result['dpr']:>5g}  "
+                f"{result['format']:<10}{result['repaint']:<8}"
+                f"{result['mean_ms']:>11.3f}{result['p99_ms']:>10.3f}"
+                f"{result['alloc_bytes_per_frame']:>11.0f}{result['cpu_ms']:>10.0f}"
+            )
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pyside": pyside_version(),
+            "platform": platform.platform(),
+            "duration": args.duration,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent="  ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+    Compares load and save times and file sizes of the profile formats.
+
+    Run from the repository root:
+        python -m benchmarks.serializers --profiles 5000 --intervals 20
+"""
+import argparse
+import statistics
+import time
+
+from standup.serializers import profile_serializers, loads_profiles
+
+from benchmarks.synthetic import make_profiles
+
+
+def time_call(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(num_profiles, num_intervals, repeat):
+    profiles = make_profiles(num_profiles, num_intervals)
+    results = []
+    for name, serializer in profile_serializers.items():
+        encoded = serializer.dumps(profiles, 1)
+        assert loads_profiles(encoded) == (1, profiles)
+        results.append({
+            "format": name,
+            "bytes": len(encoded),
+            "save_ms": time_call(lambda: serializer.dumps(profiles, 1), repeat) * 1000,
+            "load_ms": time_call(lambda: loads_profiles(encoded), repeat) * 1000,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=1000)
+    parser.add_argument("--intervals", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.profiles} profiles, {args.intervals} intervals each")
+    print(f"{'format':<14}{'size (KiB)':>12}{'save (ms)':>12}{'load (ms)':>12}")
+    for result in run(args.profiles, args.intervals, args.repeat):
+        print(
+            f"{result['format']:<14}{result['bytes'] / 1024:>12.1f}"
+            f"{result['save_ms']:>12.2f}{result['load_ms']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+    Synthetic profile stores for the benchmarks.
+"""
+import random
+
+REMINDER_NAMES = ("None", "Open URL", "Popup Window")
+
+
+def make_reminder(rng):
+    name = rng.choice(REMINDER_NAMES)
+    if name == "Open URL":
+        return {"name": name, "url": f"example.com/{rng.randrange(10000)}", "policy": rng.randrange(3)}
+    if name == "Popup Window":
+        return {"name": name, "message": f"Stand up and stretch #{rng.randrange(10000)}"}
+    return {"name": name}
+
+
+def make_profile(rng, num_intervals):
+    """
+    Returns a profile with num_intervals focus and break intervals split
+    between the two queues.
+    """
+    num_focus = max(1, num_intervals // 2)
+    num_break = max(1, num_intervals - num_focus)
+    return {
+        "session_duration": rng.randint(30, 600),
+        "focus_intervals": [
+            {"duration": rng.randint(10, 60), "reminder": make_reminder(rng)}
+            for _ in range(num_focus)
+        ],
+        "break_intervals": [
+            {"duration": rng.randint(1, 20), "reminder": make_reminder(rng)}
+            for _ in range(num_break)
+        ],
+    }
+
+
+def make_profiles(num_profiles, num_intervals, seed=0):
+    rng = random.Random(seed)
+    return {
+        f"Profile {index}": make_profile(rng, num_intervals)
+        for index in range(num_profiles)
+    }
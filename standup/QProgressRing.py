@@ -6,9 +6,53 @@
 """
 
 import math
+import time
 from PySide6 import QtGui, QtCore, QtWidgets
 
 
+class FrameStats:
+    """
+    How long painting takes.
+    recent_ns is a moving average over roughly the last 8 frames and
+    fps() the frames painted per second since the first one.
+    """
+
+    __slots__ = ("frames", "total_ns", "max_ns", "recent_ns", "first_ns", "last_ns")
+
+    def __init__(self):
+        self.frames = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.recent_ns = 0
+        self.first_ns = None
+        self.last_ns = None
+
+    def record(self, start_ns, end_ns):
+        paint_ns = end_ns - start_ns
+        if self.first_ns is None:
+            self.first_ns = start_ns
+            self.recent_ns = paint_ns
+        self.last_ns = end_ns
+        self.frames += 1
+        self.total_ns += paint_ns
+        self.max_ns = max(self.max_ns, paint_ns)
+        self.recent_ns += (paint_ns - self.recent_ns) // 8
+
+    def mean_ms(self):
+        return self.total_ns / self.frames / 1e6 if self.frames else 0.0
+
+    def fps(self):
+        if self.frames < 2:
+            return 0.0
+        return (self.frames - 1) * 1e9 / (self.last_ns - self.first_ns)
+
+    def __repr__(self):
+        return (
+            f"{self.frames} frames, {self.fps():.1f} per second, "
+            f"{self.mean_ms():.2f} ms mean, {self.max_ns / 1e6:.2f} ms max"
+        )
+
+
 class QProgressRing(QtWidgets.QWidget):
     _TOTAL_DEGREES = 360 * 16  # I'm not satisfied with this name
     # but this variable exists because
@@ -20,16 +64,37 @@ class QProgressRing(QtWidgets.QWidget):
     # since I want the progress ring
     # to start that the 12 o'clock position (90deg)
     # TODO make this easily adjustable
+    _ARC_STEP = 4  # degrees, see progressPath()
     complete = QtCore.Signal()
 
+    # The outline and its background never change between ticks, so they
+    # are drawn once into self._background and blitted. The pens, brushes
+    # and font are made once per palette and the text is a QStaticText
+    # that is only laid out again when it changes. A tick costs one
+    # pixmap blit, one arc and one text blit.
+
     def __init__(self):
         super().__init__()
         self._palette = QtGui.QGuiApplication.palette()
         self._minimum = 0
         self._maximum = 0
         self._value = 0
+        # Where the arc ends, can be between whole values (see setArcValue)
+        self._arc_value = 0
         self._clockwise = True
         self._format = "%"
+        self.frame_stats = FrameStats()
+
+        self._background = None
+        self._background_key = None
+        self._static_text = QtGui.QStaticText()
+        self._static_text.setPerformanceHint(QtGui.QStaticText.AggressiveCaching)
+        self._text_font = QtGui.QFont("monospace")
+        self._text_font.setStyleHint(QtGui.QFont.Monospace)
+        self._text_font.setPointSize(
+            12
+            )  # TODO : make this not hardcoded or change based on size of widget?
+        self.updateStyle()
 
         self.setSizePolicy(
             QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding
@@ -41,19 +106,63 @@ class QProgressRing(QtWidgets.QWidget):
         self._radius = radius
 
     def setValue(self, value):
+        if value != self._value or value != self._arc_value:
+            self.update(self.dirtyRegion(value))
         self._value = value
-        self.update()
+        self._arc_value = value
         if self._value == self._maximum:
             self.complete.emit()
 
+    def setArcValue(self, value):
+        """
+        Moves the arc to value, which may be between whole values, without
+        changing the text. setValue() moves both.
+        """
+        if value != self._arc_value and self._maximum != self._minimum:
+            self.update(self.arcRegion(self._arc_value, value))
+        self._arc_value = value
+
     def setMinimum(self, minimum):
         self._minimum = minimum
+        self.update()
 
     def setMaximum(self, maximum):
         self._maximum = maximum
+        self.update()
 
     def setFormat(self, fmt):
         self._format = fmt
+        self.update()
+
+    def updateStyle(self):
+        """
+        Makes the pens and brushes for the current palette.
+        """
+        self._outline_pen = QtGui.QPen(
+            self._palette.color(QtGui.QPalette.Active, QtGui.QPalette.Midlight)
+        )
+        self._outline_pen.setWidth(8)
+        self._outline_brush = self._palette.brush(QtGui.QPalette.Active, QtGui.QPalette.Mid)
+
+        self._progress_pen = QtGui.QPen(
+            self._palette.color(QtGui.QPalette.Active, QtGui.QPalette.Link)
+        )
+        self._progress_pen.setWidth(12)
+        self._progress_pen.setCapStyle(QtCore.Qt.RoundCap)
+        self._progress_brush = self._palette.brush(QtGui.QPalette.Active, QtGui.QPalette.Button)
+
+        self._text_pen = QtGui.QPen(
+            self._palette.color(QtGui.QPalette.Active, QtGui.QPalette.WindowText)
+        )
+        self._background = None
+
+    def displayStep(self):
+        """
+        Seconds between changes of the text in the current format.
+        """
+        if self._format == "minutes":
+            return 60
+        return 1
 
     def radius(self):
         return self._radius
@@ -82,13 +191,19 @@ class QProgressRing(QtWidgets.QWidget):
     def percentComplete(self):
         return round(((self.progress() / self.range()) * 100), 1)
 
-    def getFormattedText(self):
-        if self._value == self._maximum:
+    def getFormattedText(self, value=None):
+        """
+        The text shown at value, the current value by default.
+        """
+        if value is None:
+            value = self._value
+        remaining = self._maximum - value
+        if value == self._maximum:
             return "Done!"
         if self._format == "%":
-            return f"{self.percentComplete()}%"
+            return f"{round((value - self._minimum) / remaining * 100, 1)}%"
         elif self._format == "countdown":
-            m, s = divmod(self.remaining(), 60)
+            m, s = divmod(remaining, 60)
             h, m = divmod(m, 60)
             if h:
                 time_string = f"{h:0>2}h {m:0>2}m {s:0>2}s"
@@ -97,6 +212,80 @@ class QProgressRing(QtWidgets.QWidget):
             else:
                 time_string = f"{s:0>2}s"
             return time_string
+        elif self._format == "minutes":
+            h, m = divmod(-(-remaining // 60), 60)
+            if h:
+                return f"{h:0>2}h {m:0>2}m"
+            return f"{m:0>2}m"
+
+    def arcSweep(self, value):
+        """
+        Degrees of the ring the arc covers at value.
+        """
+        return self._TOTAL_DEGREES / 16 * (value - self._minimum) / (self._maximum - self._minimum)
+
+    def arcRect(self, from_sweep, to_sweep):
+        """
+        Bounding rectangle of the part of the ring between two sweeps,
+        including the width and caps of the pen.
+        """
+        direction = -1 if self._clockwise else 1
+        first, last = sorted(
+            self._ARC_OFFSET / 16 + direction * sweep for sweep in (from_sweep, to_sweep)
+        )
+        # The extremes of an arc are its ends and the axes it crosses
+        angles = [first, last]
+        angles += [quadrant * 90 for quadrant in range(math.ceil(first / 90), math.floor(last / 90) + 1)]
+        center = QtCore.QRectF(self._square).center()
+        xs = [center.x() + self._radius * math.cos(math.radians(angle)) for angle in angles]
+        ys = [center.y() - self._radius * math.sin(math.radians(angle)) for angle in angles]
+        # Half the pen plus a pixel for antialiasing
+        margin = self._progress_pen.widthF() / 2 + 1
+        return QtCore.QRectF(
+            QtCore.QPointF(min(xs) - margin, min(ys) - margin),
+            QtCore.QPointF(max(xs) + margin, max(ys) + margin),
+        ).toAlignedRect()
+
+    def textRect(self, size):
+        """
+        Rectangle taken up by text of the given size, centered in the ring.
+        """
+        center = QtCore.QRectF(self._square).center()
+        return QtCore.QRectF(
+            center.x() - size.width() / 2 - 1,
+            center.y() - size.height() / 2 - 1,
+            size.width() + 2,
+            size.height() + 2,
+        ).toAlignedRect()
+
+    def dirtyRegion(self, value):
+        """
+        The part of the widget that changes when the value goes from the
+        current one to value: the arc between the two and the old and the
+        new text. Starting or finishing the ring changes all of it.
+        """
+        if self._maximum == self._minimum or self._maximum in (self._value, value):
+            return QtGui.QRegion(self.rect())
+        old_text = self.textRect(self._static_text.size())
+        new_text = self.textRect(
+            QtGui.QFontMetricsF(self._text_font).size(0, self.getFormattedText(value))
+        )
+        return (
+            self.arcRegion(self._arc_value, value)
+            + QtGui.QRegion(old_text)
+            + QtGui.QRegion(new_text)
+        )
+
+    def arcRegion(self, from_value, to_value):
+        """
+        The part of the widget that changes when the arc moves between
+        two values.
+        """
+        from_sweep, to_sweep = sorted((self.arcSweep(from_value), self.arcSweep(to_value)))
+        # The last piece of the arc (see progressPath()) is drawn again
+        # as a whole, so its antialiased edge may move a little
+        from_sweep -= from_sweep % self._ARC_STEP
+        return QtGui.QRegion(self.arcRect(from_sweep, to_sweep))
 
     def calcSquare(self, center):
         self._square = QtCore.QRect(
@@ -109,83 +298,124 @@ class QProgressRing(QtWidgets.QWidget):
         self._radius = int((new_radius * 0.4))
 
     def drawOutline(self, qp):
-        circle_pen = QtGui.QPen(
-            self._palette.color(QtGui.QPalette.Active, QtGui.QPalette.Midlight)
-        )
-        circle_pen.setWidth(8)
-
-        qp.setBrush(self._palette.brush(QtGui.QPalette.Active, QtGui.QPalette.Mid))
-        qp.setPen(circle_pen)
+        qp.setBrush(self._outline_brush)
+        qp.setPen(self._outline_pen)
 
         qp.drawEllipse(self._square)
 
+    def background(self):
+        """
+        The outline drawn into a pixmap the size of the widget at the
+        screen's pixel density, drawn again only when the size, density or
+        palette changes.
+        """
+        dpr = self.devicePixelRatioF()
+        key = (self.width(), self.height(), dpr, self._palette.cacheKey())
+        if self._background is None or key != self._background_key:
+            self._background = QtGui.QPixmap(
+                math.ceil(self.width() * dpr), math.ceil(self.height() * dpr)
+            )
+            self._background.setDevicePixelRatio(dpr)
+            self._background.fill(QtCore.Qt.transparent)
+            qp = QtGui.QPainter(self._background)
+            qp.setRenderHints(QtGui.QPainter.Antialiasing)
+            self.drawOutline(qp)
+            qp.end()
+            self._background_key = key
+        return self._background
+
     def drawProgressArc(self, qp):
         if not self._maximum:
             return
 
-        progress_pen = QtGui.QPen(
-            self._palette.color(QtGui.QPalette.Active, QtGui.QPalette.Link)
-        )
-
-        progress_pen.setWidth(12)
-        progress_pen.setCapStyle(QtCore.Qt.RoundCap)
-
-        qp.setPen(progress_pen)
-        qp.setBrush(self._palette.brush(QtGui.QPalette.Active, QtGui.QPalette.Button))
+        qp.setPen(self._progress_pen)
+        qp.setBrush(self._progress_brush)
         if self._value == self._maximum:
             qp.drawEllipse(self._square)
         else:
-            percent_complete = (self._value - self._minimum) / (
-                self._maximum - self._minimum
-            )
-            arc_span = (self._TOTAL_DEGREES) * percent_complete
-            if self._clockwise:
-                arc_span *= -1
-            qp.drawArc(self._square, self._ARC_OFFSET, arc_span)
+            qp.strokePath(self.progressPath(), self._progress_pen)
+
+    def progressPath(self):
+        """
+        The arc as a path of _ARC_STEP sized pieces starting at the top.
+        drawArc() would split the arc into curves that depend on its whole
+        span, moving the antialiased edge of the part already drawn a
+        little every time the arc grows, so pixels outside dirtyRegion()
+        would go stale. This way only the last piece changes.
+        """
+        arc_span = self.arcSweep(self._arc_value)
+        direction = -1 if self._clockwise else 1
+        square = QtCore.QRectF(self._square)
+        path = QtGui.QPainterPath()
+        path.arcMoveTo(square, self._ARC_OFFSET / 16)
+        drawn = 0
+        while drawn < arc_span:
+            step = min(self._ARC_STEP, arc_span - drawn)
+            path.arcTo(square, self._ARC_OFFSET / 16 + direction * drawn, direction * step)
+            drawn += step
+        return path
+
+    def staticText(self):
+        """
+        The formatted text, laid out again only when it changes.
+        """
+        text = self.getFormattedText()
+        if text != self._static_text.text():
+            self._static_text.setText(text)
+            self._static_text.prepare(QtGui.QTransform(), self._text_font)
+        return self._static_text
 
     def drawText(self, qp):
-        qp.setPen(
-            QtGui.QPen(
-                self._palette.color(QtGui.QPalette.Active, QtGui.QPalette.WindowText)
-            )
-        )
-
-        qp.setBrush(
-            self._palette.brush(QtGui.QPalette.Active, QtGui.QPalette.WindowText)
+        qp.setPen(self._text_pen)
+        qp.setFont(self._text_font)
+        static_text = self.staticText()
+        size = static_text.size()
+        center = QtCore.QRectF(self._square).center()
+        qp.drawStaticText(
+            QtCore.QPointF(center.x() - size.width() / 2, center.y() - size.height() / 2),
+            static_text,
         )
 
-        timer_font = QtGui.QFont("monospace")
-        timer_font.setStyleHint(QtGui.QFont.Monospace)
-        timer_font.setPointSize(
-            12
-            )  # TODO : make this not hardcoded or change based on size of widget?
-
-        qp.setFont(timer_font)
-        qp.drawText(self._square, int(QtCore.Qt.AlignCenter), self.getFormattedText())
+    def drawRing(self, qp, text=True):
+        """
+        Draws the whole ring with qp, which may paint on something other
+        than the widget, e.g. the icons of standup.tray.
+        """
+        qp.drawPixmap(0, 0, self.background())
+        qp.setRenderHints(QtGui.QPainter.Antialiasing)
+        self.drawProgressArc(qp)
+        if text:
+            self.drawText(qp)
 
     def render(self):
         qp = QtGui.QPainter()
         qp.begin(self)
-        qp.setRenderHints(qp.Antialiasing)
-        self.drawOutline(qp)
-        self.drawProgressArc(qp)
-        self.drawText(qp)
+        self.drawRing(qp)
         qp.end()
 
     def paintEvent(self, paint_event):
         super().paintEvent(paint_event)
+        start = time.perf_counter_ns()
         self.render()
+        self.frame_stats.record(start, time.perf_counter_ns())
 
     def resizeEvent(self, resize_event):
         super().resizeEvent(resize_event)
         self.calcRadius(resize_event.size())
         self.calcSquare(self.rect().center())
+        self._background = None
+
+    def changeEvent(self, change_event):
+        super().changeEvent(change_event)
+        if change_event.type() == QtCore.QEvent.PaletteChange:
+            self._palette = self.palette()
+            self.updateStyle()
+            self.update()
 
 
 # Testing
 if __name__ == "__main__":
     import sys
-    import time
 
     app = QtWidgets.QApplication([])
     ex = QtWidgets.QWidget()
@@ -1,6 +1,13 @@
-from standup import standup
+import sys
+
+from standup import cli
 
 def main():
+    status = cli.main()
+    if status is not None:
+        sys.exit(status)
+    # Only load the GUI when it is needed
+    from standup import standup
     standup.main()
 
 if __name__ == "__main__":
@@ -0,0 +1,290 @@
+"""
+    Works out what a session will do without running it.
+
+    Steps alternate focus and break (see standup.session), so after
+    2 * lcm(len(focus), len(break)) steps both queues are back at their
+    first interval and the session repeats. With an empty break queue
+    the period is lcm(len(focus), 2) instead, since steps are still
+    reported as focus and break in turn.
+    analyze_session() builds that one cycle, skips the whole cycles that
+    fit in the session arithmetically and binary searches the prefix sums
+    of the cycle for the interval that crosses the end of the session.
+    The cost depends on the length of the queues, never on the length of
+    the session.
+
+    Profiles with a schedule pattern (see standup.patterns) are solved the
+    same way with the pattern as the cycle, see analyze_pattern().
+
+    analyze_profiles() does the same for many profiles at once. With NumPy
+    installed each chunk of profiles is solved with vectorized operations
+    over the cycles of the whole chunk, and chunks can be spread over a
+    pool of processes.
+"""
+import concurrent.futures
+import itertools
+import math
+import os
+from bisect import bisect_left
+from collections import deque, namedtuple
+
+from standup.patterns import parse_pattern
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+SessionSummary = namedtuple(
+    "SessionSummary",
+    (
+        "intervals",        # number of intervals that run
+        "focus_intervals",
+        "break_intervals",
+        "focus_time",       # seconds
+        "break_time",
+        "end",              # seconds from the start when the last interval ends
+        "last_is_break",    # the last interval, None if nothing runs
+        "last_duration",
+        "last_remaining",   # session time left when the last interval starts
+        "overrun",          # how far the last interval runs past the session length
+    ),
+)
+
+EMPTY_SUMMARY = SessionSummary(0, 0, 0, 0, 0, 0, None, None, None, 0)
+
+
+def session_cycle(focus_durations, break_durations):
+    """
+    Returns the durations of one full cycle of the session. Even positions
+    are reported as focus and odd ones as break.
+    """
+    num_focus, num_break = len(focus_durations), len(break_durations)
+    if not num_break:
+        period = num_focus * 2 // math.gcd(num_focus, 2)
+        return [focus_durations[step % num_focus] for step in range(period)]
+    pairs = num_focus * num_break // math.gcd(num_focus, num_break)
+    cycle = []
+    for pair in range(pairs):
+        cycle.append(focus_durations[pair % num_focus])
+        cycle.append(break_durations[pair % num_break])
+    return cycle
+
+
+def _check_durations(focus_durations, break_durations):
+    if any(duration <= 0 for duration in itertools.chain(focus_durations, break_durations)):
+        raise ValueError("Interval durations must be positive")
+
+
+def analyze_session(total_length, focus_durations, break_durations):
+    """
+    Returns a SessionSummary for a session of total_length seconds.
+    Gives the same result as stepping a SessionQueue to the end.
+    """
+    _check_durations(focus_durations, break_durations)
+    if total_length <= 0 or not focus_durations:
+        return EMPTY_SUMMARY
+    cycle = session_cycle(focus_durations, break_durations)
+    prefix = [0, *itertools.accumulate(cycle)]
+    focus_prefix = [0, *itertools.accumulate(
+        duration if step % 2 == 0 else 0 for step, duration in enumerate(cycle)
+    )]
+    cycle_time = prefix[-1]
+
+    # Whole cycles that end before the session does, then the steps of
+    # the last, partial cycle
+    cycles = (total_length - 1) // cycle_time
+    remaining = total_length - cycles * cycle_time
+    steps = bisect_left(prefix, remaining)
+
+    half_period = len(cycle) // 2
+    focus_time = cycles * focus_prefix[-1] + focus_prefix[steps]
+    end = cycles * cycle_time + prefix[steps]
+    return SessionSummary(
+        intervals=cycles * len(cycle) + steps,
+        focus_intervals=cycles * half_period + (steps + 1) // 2,
+        break_intervals=cycles * half_period + steps // 2,
+        focus_time=focus_time,
+        break_time=end - focus_time,
+        end=end,
+        last_is_break=(steps - 1) % 2 == 1,
+        last_duration=cycle[steps - 1],
+        last_remaining=remaining - prefix[steps - 1],
+        overrun=end - total_length,
+    )
+
+
+def analyze_pattern(total_length, pattern):
+    """
+    Returns a SessionSummary for a session of total_length seconds that
+    repeats a parsed pattern. Gives the same result as stepping a
+    PatternQueue to the end.
+    """
+    if total_length <= 0:
+        return EMPTY_SUMMARY
+    cycles = (total_length - 1) // pattern.duration
+    remaining = total_length - cycles * pattern.duration
+    interval, start, before, focus_before, focus_time_before = pattern.locate(remaining - 1)
+    intervals = cycles * pattern.length + before + 1
+    focus_intervals = cycles * pattern.focus_count + focus_before + interval.focus_count
+    focus_time = cycles * pattern.focus_time + focus_time_before + interval.focus_time
+    end = cycles * pattern.duration + start + interval.duration
+    return SessionSummary(
+        intervals=intervals,
+        focus_intervals=focus_intervals,
+        break_intervals=intervals - focus_intervals,
+        focus_time=focus_time,
+        break_time=end - focus_time,
+        end=end,
+        last_is_break=interval.is_break,
+        last_duration=interval.duration,
+        last_remaining=remaining - start,
+        overrun=end - total_length,
+    )
+
+
+def profile_durations(profile):
+    """
+    Returns (total_length, focus_durations, break_durations) in seconds for
+    a stored profile, which keeps its durations in minutes.
+    """
+    return (
+        profile["session_duration"] * 60,
+        [interval["duration"] * 60 for interval in profile["focus_intervals"]],
+        [interval["duration"] * 60 for interval in profile["break_intervals"]],
+    )
+
+
+def analyze_profile(profile):
+    if profile.get("pattern"):
+        return analyze_pattern(profile["session_duration"] * 60, parse_pattern(profile["pattern"]))
+    return analyze_session(*profile_durations(profile))
+
+
+def _prepare_chunk(chunk):
+    """
+    Converts a chunk of (name, profile) pairs to (name, durations, summary).
+    Profiles with a pattern are analyzed right away and have no durations.
+    Profiles that cannot be analyzed have neither.
+    """
+    prepared = []
+    for profile_name, profile in chunk:
+        durations = summary = None
+        try:
+            total_length, focus_durations, break_durations = profile_durations(profile)
+            # A string duration would be repeated 60 times above and only
+            # fail once the session is solved, with the whole chunk
+            if not all(
+                isinstance(duration, int)
+                for duration in itertools.chain((total_length,), focus_durations, break_durations)
+            ):
+                raise TypeError("Durations must be integers")
+            if profile.get("pattern"):
+                summary = analyze_profile(profile)
+            else:
+                _check_durations(focus_durations, break_durations)
+                durations = total_length, focus_durations, break_durations
+        except (AttributeError, KeyError, OverflowError, TypeError, ValueError):
+            durations = summary = None
+        prepared.append((profile_name, durations, summary))
+    return prepared
+
+
+def _analyze_chunk(chunk):
+    return [
+        (profile_name, summary if durations is None else analyze_session(*durations))
+        for profile_name, durations, summary in _prepare_chunk(chunk)
+    ]
+
+
+def _analyze_chunk_numpy(chunk):
+    """
+    Same as _analyze_chunk() but solves every profile of the chunk at once.
+    The cycles of all profiles are concatenated into one array and a single
+    cumulative sum over it gives the prefix sums of every cycle, so the
+    binary searches for the last interval become one np.searchsorted call.
+    """
+    prepared = _prepare_chunk(chunk)
+    results = [
+        (profile_name, summary if session is None else EMPTY_SUMMARY)
+        for profile_name, session, summary in prepared
+    ]
+    positions, totals, periods, durations = [], [], [], []
+    for position, (_, session, _) in enumerate(prepared):
+        if session is None or session[0] <= 0 or not session[1]:
+            continue
+        total_length, focus_durations, break_durations = session
+        cycle = session_cycle(focus_durations, break_durations)
+        positions.append(position)
+        totals.append(total_length)
+        periods.append(len(cycle))
+        durations += cycle
+    if not positions:
+        return results
+
+    durations = np.array(durations, dtype=np.int64)
+    periods = np.array(periods, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(periods)[:-1]))
+    totals = np.array(totals, dtype=np.int64)
+    # Every period is even, so the parity of a step in the concatenated
+    # array is its parity within its own cycle.
+    is_focus = np.arange(len(durations)) % 2 == 0
+    prefix = np.concatenate(([0], np.cumsum(durations)))
+    focus_prefix = np.concatenate(([0], np.cumsum(np.where(is_focus, durations, 0))))
+
+    base = prefix[starts]
+    focus_base = focus_prefix[starts]
+    cycle_time = prefix[starts + periods] - base
+    focus_cycle_time = focus_prefix[starts + periods] - focus_base
+
+    whole_cycles = (totals - 1) // cycle_time
+    remaining = totals - whole_cycles * cycle_time
+    steps = np.searchsorted(prefix, base + remaining, side="left") - starts
+
+    half_periods = periods // 2
+    partial_time = prefix[starts + steps] - base
+    focus_time = whole_cycles * focus_cycle_time + focus_prefix[starts + steps] - focus_base
+    end = whole_cycles * cycle_time + partial_time
+    columns = zip(
+        (whole_cycles * periods + steps).tolist(),
+        (whole_cycles * half_periods + (steps + 1) // 2).tolist(),
+        (whole_cycles * half_periods + steps // 2).tolist(),
+        focus_time.tolist(),
+        (end - focus_time).tolist(),
+        end.tolist(),
+        ((steps - 1) % 2 == 1).tolist(),
+        durations[starts + steps - 1].tolist(),
+        (remaining - (prefix[starts + steps - 1] - base)).tolist(),
+        (end - totals).tolist(),
+    )
+    for position, summary in zip(positions, columns):
+        results[position] = (results[position][0], SessionSummary(*summary))
+    return results
+
+
+def analyze_profiles(profiles, processes=1, chunk_size=2000):
+    """
+    Yields (name, SessionSummary) for every (name, profile) pair in
+    profiles, in order. The summary is None for an invalid profile.
+    Profiles are consumed chunk_size at a time, so any iterable works,
+    e.g. a store's iter_profiles(). processes > 1 analyzes chunks in that
+    many worker processes, None uses one per CPU.
+    """
+    analyze_chunk = _analyze_chunk if np is None else _analyze_chunk_numpy
+    if processes is None:
+        processes = os.cpu_count() or 1
+    profiles = iter(profiles)
+    chunks = iter(lambda: list(itertools.islice(profiles, chunk_size)), [])
+    if processes <= 1:
+        for chunk in chunks:
+            yield from analyze_chunk(chunk)
+        return
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        # Keep a couple of chunks per worker in flight instead of reading
+        # the whole store ahead of the workers
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(analyze_chunk, chunk))
+            if len(in_flight) >= 2 * processes:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
@@ -0,0 +1,224 @@
+"""
+    Crash-safe checkpoints of the running session.
+
+    The session being run (the data of SessionOptions) is written to
+    session.json once when it starts. How far it has got is kept in
+    session.state, a 128 byte file that stays memory-mapped while the
+    session runs and is updated in place, so a checkpoint is a memcpy and
+    an msync of one page instead of writing a new file.
+
+    session.state holds two copies of the position record. Each update
+    overwrites the older copy and bumps a sequence number, and every copy
+    carries a crc32, so a write torn by a crash or power loss only ever
+    damages the copy being written and the other one is still valid.
+
+    Several instances of the app share the data directory, so while one
+    has session.state open it holds an exclusive lock on it. Another
+    instance neither offers to resume that session nor checkpoints its
+    own sessions over it.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from standup.profiles import _atomic_write, get_profile_location
+
+# magic, version, flags, sequence, elapsed seconds, crc32 of session.json,
+# wall clock time of the update, followed by a crc32 of all of that
+_RECORD = struct.Struct(">4sHHQQId")
+_CHECKSUM = struct.Struct(">I")
+_SLOT_SIZE = 64
+_FILE_SIZE = 2 * _SLOT_SIZE
+MAGIC = b"SUSC"
+VERSION = 1
+
+ACTIVE = 0x1
+PAUSED = 0x2
+
+
+def _try_lock(fd):
+    """
+    Takes an exclusive lock on fd without waiting.
+    Returns False if another process holds it.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            # Past the end of the file, as the locked bytes cannot be
+            # written through the mapping
+            os.lseek(fd, _FILE_SIZE, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd):
+    if fcntl is None:
+        os.lseek(fd, _FILE_SIZE, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    # flock locks go away with the file descriptor
+
+
+def get_checkpoint_location():
+    return os.path.join(os.path.dirname(get_profile_location()), "session.state")
+
+
+def get_definition_location(filename):
+    return os.path.splitext(filename)[0] + ".json"
+
+
+class SessionCheckpoint:
+    """
+    Writer and reader of the session checkpoint.
+    start() begins a new session, update() records its position and
+    clear() marks it finished. load() returns the session that was left
+    running, if any.
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = get_checkpoint_location()
+        self.filename = filename
+        self.definition_filename = get_definition_location(filename)
+        self._fd = None
+        self._buffer = None
+        self._sequence = 0
+        self._definition_crc = 0
+
+    def _open(self):
+        """
+        Maps session.state and locks it for this process.
+        Returns False if another process has it open.
+        """
+        if self._buffer is not None:
+            return True
+        fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        if not _try_lock(fd):
+            os.close(fd)
+            return False
+        try:
+            if os.fstat(fd).st_size != _FILE_SIZE:
+                os.ftruncate(fd, _FILE_SIZE)
+            self._buffer = mmap.mmap(fd, _FILE_SIZE)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        latest = self._read_latest()
+        self._sequence = latest[1] if latest is not None else 0
+        return True
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            _unlock(self._fd)
+            os.close(self._fd)
+            self._buffer = self._fd = None
+
+    def _read_slot(self, slot):
+        start = slot * _SLOT_SIZE
+        record = self._buffer[start:start + _RECORD.size]
+        (checksum,) = _CHECKSUM.unpack_from(self._buffer, start + _RECORD.size)
+        if zlib.crc32(record) != checksum:
+            return None
+        fields = _RECORD.unpack(record)
+        if fields[0] != MAGIC or fields[1] != VERSION:
+            return None
+        return fields[2:]
+
+    def _read_latest(self):
+        """
+        Returns (flags, sequence, elapsed, definition_crc, updated) of the
+        newest valid copy or None.
+        """
+        slots = [self._read_slot(slot) for slot in range(2)]
+        slots = [fields for fields in slots if fields is not None]
+        if not slots:
+            return None
+        return max(slots, key=lambda fields: fields[1])
+
+    def _write(self, flags, elapsed):
+        self._sequence += 1
+        record = _RECORD.pack(
+            MAGIC, VERSION, flags, self._sequence, int(elapsed), self._definition_crc, time.time()
+        )
+        start = (self._sequence % 2) * _SLOT_SIZE
+        self._buffer[start:start + _RECORD.size] = record
+        _CHECKSUM.pack_into(self._buffer, start + _RECORD.size, zlib.crc32(record))
+        self._buffer.flush()
+
+    def start(self, definition):
+        """
+        Records a new session. definition is what SessionOptions.putData()
+        needs to set the session up again.
+        Nothing is recorded while another instance has the checkpoint open.
+        """
+        if not self._open():
+            return
+        encoded = json.dumps(definition, separators=(",", ":")).encode("utf-8")
+        _atomic_write(self.definition_filename, lambda output: output.write(encoded), "wb")
+        self._definition_crc = zlib.crc32(encoded)
+        self._write(ACTIVE, 0)
+
+    def update(self, elapsed, paused=False):
+        """
+        Records that the session has run for elapsed seconds.
+        """
+        if self._buffer is None:
+            return
+        self._write(ACTIVE | (PAUSED if paused else 0), elapsed)
+
+    def clear(self):
+        """
+        Marks the session as finished so it is not offered for resuming.
+        """
+        if self._buffer is None:
+            return
+        self._write(0, 0)
+        self.close()
+        try:
+            os.remove(self.definition_filename)
+        except OSError:
+            pass
+
+    def load(self):
+        """
+        Returns (definition, elapsed, paused, updated) for a session that
+        was still running when the app last stopped, or None. A session
+        that another instance is running is not returned.
+        updated is the wall clock time of the last checkpoint.
+        The checkpoint stays locked if a session is returned, so it is
+        not offered to another instance as well.
+        """
+        if not os.path.exists(self.filename) or not self._open():
+            return None
+        state = self._load_state()
+        if state is None:
+            # Leave it to whichever instance starts a session first
+            self.close()
+        return state
+
+    def _load_state(self):
+        latest = self._read_latest()
+        if latest is None or not latest[0] & ACTIVE:
+            return None
+        flags, _, elapsed, definition_crc, updated = latest
+        try:
+            with open(self.definition_filename, "rb") as definition_file:
+                encoded = definition_file.read()
+        except FileNotFoundError:
+            return None
+        if zlib.crc32(encoded) != definition_crc:
+            return None
+        return json.loads(encoded), elapsed, bool(flags & PAUSED), updated
@@ -0,0 +1,290 @@
+"""
+    Command line interface for managing Stand Up profiles in bulk.
+
+    Profiles are exchanged as JSON Lines, one profile per line:
+        {"name": "Pomodoro", "profile": {"session_duration": 120, ...}}
+    Records are read and written one at a time, so files and stores with
+    hundreds of thousands of profiles are handled without loading them
+    into memory. None of the commands start the GUI.
+
+    Usage:
+        python -m standup                             start the GUI
+        python -m standup list
+        python -m standup export profiles.jsonl
+        python -m standup import profiles.jsonl
+        python -m standup validate profiles.jsonl     or the store if no file is given
+        python -m standup analyze                     what every stored session will run
+        python -m standup simulate Pomodoro           run a session on a virtual clock
+
+    A file name of - means stdin or stdout.
+"""
+import argparse
+import contextlib
+import json
+import sys
+
+from standup import analysis, profiles, simulation
+
+
+class RecordError(ValueError):
+    pass
+
+
+@contextlib.contextmanager
+def open_stream(filename, mode):
+    if filename == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+        return
+    with open(filename, mode, encoding="utf-8") as stream:
+        yield stream
+
+
+def read_records(stream):
+    """
+    Yields (line number, name, profile, errors) for every record in a
+    JSON Lines stream. Blank lines are skipped.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise RecordError("record is not an object")
+            profile_name = record.get("name")
+            if not isinstance(profile_name, str) or not profile_name.strip():
+                raise RecordError("record has no name")
+            if "profile" not in record:
+                raise RecordError("record has no profile")
+        except ValueError as error:
+            yield line_number, None, None, [str(error)]
+            continue
+        profile = record["profile"]
+        yield line_number, profile_name, profile, profiles.profile_errors(profile)
+
+
+def write_record(stream, profile_name, profile):
+    stream.write(json.dumps({"name": profile_name, "profile": profile}, separators=(",", ":")))
+    stream.write("\n")
+
+
+def report(where, errors):
+    for error in errors:
+        print(f"{where}: {error}", file=sys.stderr)
+
+
+def get_store(args):
+    if args.backend is None:
+        return profiles.get_profile_store()
+    return profiles.profile_backends[args.backend]()
+
+
+def list_profiles(args):
+    for profile_name in get_store(args).names():
+        print(profile_name)
+    return 0
+
+
+def export_profiles(args):
+    store = get_store(args)
+    count = 0
+    with open_stream(args.file, "w") as stream:
+        for profile_name, profile in store.iter_profiles():
+            write_record(stream, profile_name, profile)
+            count += 1
+    print(f"Exported {count} profiles", file=sys.stderr)
+    return 0
+
+
+def import_profiles(args):
+    """
+    Saves the valid records to the store, batch_size profiles per write.
+    Invalid records are reported and skipped, and so are names that only
+    differ by case from a stored or already imported profile, since the
+    GUI treats those as the same name.
+    """
+    if args.batch_size < 1:
+        print("--batch-size must be at least 1", file=sys.stderr)
+        return 2
+    store = get_store(args)
+    taken = {profile_name.lower(): profile_name for profile_name in store.names()}
+    batch = {}
+    imported = skipped = 0
+    with open_stream(args.file, "r") as stream:
+        for line_number, profile_name, profile, errors in read_records(stream):
+            if not errors:
+                existing = taken.setdefault(profile_name.lower(), profile_name)
+                if existing != profile_name:
+                    errors = [f"a profile named {existing!r} already exists"]
+            if errors:
+                report(f"{args.file}:{line_number}", errors)
+                skipped += 1
+                continue
+            batch[profile_name] = profile
+            if len(batch) >= args.batch_size:
+                store.apply_changes(batch)
+                imported += len(batch)
+                batch = {}
+    if batch:
+        store.apply_changes(batch)
+        imported += len(batch)
+    print(f"Imported {imported} profiles, skipped {skipped}", file=sys.stderr)
+    return 1 if skipped else 0
+
+
+def validate_profiles(args):
+    invalid = checked = 0
+    if args.file is None:
+        for profile_name, profile in get_store(args).iter_profiles():
+            errors = profiles.profile_errors(profile)
+            report(profile_name, errors)
+            invalid += bool(errors)
+            checked += 1
+    else:
+        with open_stream(args.file, "r") as stream:
+            for line_number, _, _, errors in read_records(stream):
+                report(f"{args.file}:{line_number}", errors)
+                invalid += bool(errors)
+                checked += 1
+    print(f"{checked - invalid} of {checked} profiles are valid", file=sys.stderr)
+    return 1 if invalid else 0
+
+
+def analyze_profiles(args):
+    """
+    Writes a JSON Lines summary of every stored profile's session.
+    """
+    if args.processes < 0:
+        print("--processes must not be negative", file=sys.stderr)
+        return 2
+    store = get_store(args)
+    invalid = 0
+    with open_stream(args.output, "w") as stream:
+        for profile_name, summary in analysis.analyze_profiles(
+            store.iter_profiles(), args.processes or None
+        ):
+            if summary is None:
+                report(profile_name, ["cannot be analyzed, run validate for details"])
+                invalid += 1
+                continue
+            stream.write(json.dumps({"name": profile_name, **summary._asdict()}))
+            stream.write("\n")
+    return 1 if invalid else 0
+
+
+def simulate_profile(args):
+    """
+    Runs sessions of a stored profile on a virtual clock and checks every
+    reminder. Writes the reminders as JSON Lines unless --soak is given,
+    which only reports totals and how the memory in use changed.
+    """
+    if args.sessions < 1:
+        print("--sessions must be at least 1", file=sys.stderr)
+        return 2
+    profile = get_store(args).load(args.profile)
+    if profile is None:
+        print(f"There is no profile named {args.profile!r}", file=sys.stderr)
+        return 2
+    errors = profiles.profile_errors(profile)
+    if errors:
+        report(args.profile, errors)
+        return 1
+    if args.soak:
+        result = simulation.soak(profile, args.sessions)
+        report(args.profile, result.errors)
+        print(
+            f"Ran {result.sessions} sessions, {result.reminders} reminders, "
+            f"{result.simulated_time / 3600:.1f} hours. Memory in use went from "
+            f"{result.memory_start / 1024:.1f} KiB to {result.memory_end / 1024:.1f} KiB, "
+            f"peak {result.memory_peak / 1024:.1f} KiB",
+            file=sys.stderr,
+        )
+        return 1 if result.errors else 0
+    invalid = 0
+    with open_stream(args.output, "w") as stream:
+        for session, (events, errors) in enumerate(simulation.simulate(profile, args.sessions), 1):
+            for event in events:
+                record = event._asdict()
+                record["reminder"] = {
+                    "kind": "break" if event.reminder[0] else "focus",
+                    "interval": event.reminder[1] + 1,
+                }
+                stream.write(json.dumps(record))
+                stream.write("\n")
+            if errors:
+                report(f"{args.profile}, session {session}", errors)
+                invalid += 1
+    return 1 if invalid else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="standup", description="Manage Stand Up profiles. Run without a command to start the GUI."
+    )
+    parser.add_argument(
+        "--backend", choices=list(profiles.profile_backends),
+        help="Profile store to use (default: $STANDUP_PROFILE_BACKEND or json)",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    list_parser = commands.add_parser("list", help="Print the name of every profile")
+    list_parser.set_defaults(run=list_profiles)
+
+    export_parser = commands.add_parser("export", help="Write every profile as JSON Lines")
+    export_parser.add_argument("file", nargs="?", default="-")
+    export_parser.set_defaults(run=export_profiles)
+
+    import_parser = commands.add_parser(
+        "import", help="Save profiles from JSON Lines, replacing profiles with the same name"
+    )
+    import_parser.add_argument("file", nargs="?", default="-")
+    import_parser.add_argument(
+        "--batch-size", type=int, default=500, help="Profiles saved per write (default: 500)"
+    )
+    import_parser.set_defaults(run=import_profiles)
+
+    validate_parser = commands.add_parser(
+        "validate", help="Check profiles in a JSON Lines file, or in the store if no file is given"
+    )
+    validate_parser.add_argument("file", nargs="?")
+    validate_parser.set_defaults(run=validate_profiles)
+
+    analyze_parser = commands.add_parser(
+        "analyze", help="Summarize the session of every profile as JSON Lines"
+    )
+    analyze_parser.add_argument("output", nargs="?", default="-")
+    analyze_parser.add_argument(
+        "--processes", type=int, default=1,
+        help="Worker processes, 0 for one per CPU (default: 1)",
+    )
+    analyze_parser.set_defaults(run=analyze_profiles)
+
+    simulate_parser = commands.add_parser(
+        "simulate", help="Run sessions of a profile on a virtual clock and check the reminders"
+    )
+    simulate_parser.add_argument("profile")
+    simulate_parser.add_argument("output", nargs="?", default="-")
+    simulate_parser.add_argument(
+        "--sessions", type=int, default=1, help="Sessions to run back to back (default: 1)"
+    )
+    simulate_parser.add_argument(
+        "--soak", action="store_true",
+        help="Only report totals and how the memory in use changed",
+    )
+    simulate_parser.set_defaults(run=simulate_profile)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs a command and returns the exit status, or None if no command was
+    given and the GUI should start.
+    """
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        return None
+    # Every command goes through the store once, keeping it in memory
+    # would only make the memory used grow with the size of the store
+    profiles.profile_cache.enabled = False
+    return args.run(args)
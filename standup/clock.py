@@ -0,0 +1,170 @@
+"""
+    Time sources for timing intervals.
+
+    Countdowns are measured on a monotonic clock, so changing the system
+    time or a daylight saving switch never shortens or stretches an
+    interval. Where the platform has one, the clock keeps counting while
+    the computer is suspended (CLOCK_BOOTTIME on Linux), so an interval
+    that should have ended during a suspend ends as soon as the computer
+    wakes up.
+
+    Code that waits for time to pass takes a Clock, which tells the time
+    and calls back at a deadline. The app uses a clock that runs on the
+    Qt event loop (standup.standup.QtClock). VirtualClock only moves when
+    it is told to, jumping from one deadline to the next, so hours of
+    timers run in as long as their callbacks take (see standup.simulation).
+"""
+import heapq
+import itertools
+import time
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_MS = 1_000_000
+
+if hasattr(time, "CLOCK_BOOTTIME"):
+    def monotonic_ns():
+        return time.clock_gettime_ns(time.CLOCK_BOOTTIME)
+else:
+    # time.monotonic_ns counts suspended time on Windows but not on macOS
+    monotonic_ns = time.monotonic_ns
+
+
+class Clock:
+    """
+    Interface of the clocks.
+    now_ns() is the time on a monotonic clock in nanoseconds.
+    call_at() arranges for callback() to be called once now_ns() has
+    reached deadline_ns, never before, and returns a handle whose cancel()
+    method stops it.
+    """
+
+    def now_ns(self):
+        return monotonic_ns()
+
+    def call_at(self, deadline_ns, callback):
+        raise NotImplementedError
+
+
+class _VirtualCall:
+    __slots__ = ("deadline_ns", "sequence", "callback")
+
+    def __init__(self, deadline_ns, sequence, callback):
+        self.deadline_ns = deadline_ns
+        self.sequence = sequence
+        self.callback = callback
+
+    def __lt__(self, other):
+        return (self.deadline_ns, self.sequence) < (other.deadline_ns, other.sequence)
+
+    def cancel(self):
+        self.callback = None
+
+
+class VirtualClock(Clock):
+    """
+    Clock that stands still until advance() or run() moves it.
+    Calls due at the same time run in the order they were made.
+    """
+
+    def __init__(self, start_ns=0):
+        self._now = start_ns
+        self._calls = []
+        self._sequence = itertools.count()
+
+    def now_ns(self):
+        return self._now
+
+    def call_at(self, deadline_ns, callback):
+        call = _VirtualCall(deadline_ns, next(self._sequence), callback)
+        heapq.heappush(self._calls, call)
+        return call
+
+    def pending(self):
+        """
+        Number of calls waiting to run, including cancelled ones.
+        """
+        return len(self._calls)
+
+    def run_until(self, deadline_ns):
+        """
+        Moves the clock to deadline_ns, running every call due on the way
+        at the time it is due.
+        """
+        while self._calls and self._calls[0].deadline_ns <= deadline_ns:
+            self._run_next()
+        self._now = max(self._now, deadline_ns)
+
+    def advance(self, ns):
+        self.run_until(self._now + ns)
+
+    def run(self):
+        """
+        Runs calls until there are none left, including the calls they make.
+        Returns how many ran.
+        """
+        ran = 0
+        while self._calls:
+            ran += self._run_next()
+        return ran
+
+    def _run_next(self):
+        call = heapq.heappop(self._calls)
+        if call.callback is None:
+            return 0
+        self._now = max(self._now, call.deadline_ns)
+        callback, call.callback = call.callback, None
+        callback()
+        return 1
+
+
+class Countdown:
+    """
+    Time left of an interval, measured on a clock.
+    While running only the deadline is kept and the time left is worked
+    out from it, so a countdown cannot drift however late it is looked at.
+    """
+
+    __slots__ = ("clock", "paused", "duration", "deadline", "remaining")
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.paused = True
+        self.duration = 0
+        # Deadline on the clock while running,
+        # time left in nanoseconds while paused
+        self.deadline = None
+        self.remaining = 0
+
+    def reset(self, duration, elapsed=0):
+        """
+        Sets up a paused countdown of duration seconds, elapsed seconds
+        into it.
+        """
+        self.pause()
+        self.duration = duration
+        self.remaining = (duration - elapsed) * NS_PER_SECOND
+
+    def resume(self):
+        if self.paused:
+            self.deadline = self.clock.now_ns() + self.remaining
+            self.paused = False
+
+    def pause(self):
+        if not self.paused:
+            self.remaining = max(0, self.deadline - self.clock.now_ns())
+            self.deadline = None
+            self.paused = True
+
+    def time_left(self):
+        """
+        Nanoseconds left.
+        """
+        if self.paused:
+            return self.remaining
+        return max(0, self.deadline - self.clock.now_ns())
+
+    def elapsed(self):
+        """
+        Whole seconds that have run.
+        """
+        return self.duration - -(-self.time_left() // NS_PER_SECOND)
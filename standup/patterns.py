@@ -0,0 +1,299 @@
+"""
+    Run-length encoded schedule patterns.
+
+    A pattern spells out a whole schedule in a few characters instead of
+    one focus or break entry per interval:
+
+        4x(25f,5b),15b
+
+    is four rounds of 25 minutes of focus and a 5 minute break followed by
+    a 15 minute break. The grammar is
+
+        sequence := item ("," item)*
+        item     := [count "x"] ("(" sequence ")" | interval)
+        interval := minutes ("f" | "b") ["@" reminder]
+
+    reminder picks which focus (for f) or break (for b) interval of the
+    profile provides the reminder, counting from 1. It defaults to the
+    first one. Counts and minutes go up to MAX_NUMBER.
+
+    Patterns are parsed into a small tree that is never expanded. Every
+    node knows its totals, so a point in time is found by skipping whole
+    repetitions arithmetically and binary searching the children of one
+    repetition, and intervals() walks the tree lazily.
+"""
+import re
+from array import array
+from bisect import bisect_right
+
+
+class PatternError(ValueError):
+    pass
+
+
+# Largest duration or repeat count that can be written in a pattern
+MAX_NUMBER = 999_999
+# Largest duration or number of intervals of a whole pattern, which are
+# kept in unsigned 64 bit arrays
+MAX_TOTAL = 2 ** 63 - 1
+
+
+class PatternInterval:
+    """
+    A single interval. duration is in seconds and reminder is the 0-based
+    index of the reminder in the focus or break list.
+    """
+
+    __slots__ = ("duration", "is_break", "reminder")
+    length = 1
+
+    def __init__(self, duration, is_break, reminder=0):
+        self.duration = duration
+        self.is_break = is_break
+        self.reminder = reminder
+
+    @property
+    def focus_count(self):
+        return 0 if self.is_break else 1
+
+    @property
+    def focus_time(self):
+        return 0 if self.is_break else self.duration
+
+    def intervals(self, offset=0):
+        yield self
+
+    def locate(self, offset):
+        return self, 0, 0, 0, 0
+
+    def leaves(self):
+        yield self
+
+    def format(self, unit):
+        text = f"{self.duration // unit}{'b' if self.is_break else 'f'}"
+        if self.reminder:
+            text += f"@{self.reminder + 1}"
+        return text
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.duration}, {self.is_break}, {self.reminder})"
+
+
+class PatternBlock:
+    """
+    items repeated count times.
+    The totals of one repetition are kept as prefix sums over the items,
+    so finding the item running at a given time is a binary search.
+    """
+
+    __slots__ = (
+        "count",
+        "items",
+        "starts",
+        "_lengths",
+        "_focus_counts",
+        "_focus_times",
+        "length",
+        "duration",
+        "focus_count",
+        "focus_time",
+    )
+
+    def __init__(self, count, items):
+        if count < 1:
+            raise PatternError("Repeat counts must be at least 1")
+        if not items:
+            raise PatternError("Groups must not be empty")
+        self.count = count
+        self.items = tuple(items)
+        self.starts = array("Q", [0])
+        self._lengths = array("Q", [0])
+        self._focus_counts = array("Q", [0])
+        self._focus_times = array("Q", [0])
+        try:
+            for item in self.items:
+                self.starts.append(self.starts[-1] + item.duration)
+                self._lengths.append(self._lengths[-1] + item.length)
+                self._focus_counts.append(self._focus_counts[-1] + item.focus_count)
+                self._focus_times.append(self._focus_times[-1] + item.focus_time)
+        except OverflowError:
+            raise PatternError("Pattern is too long") from None
+        self.length = count * self._lengths[-1]
+        self.duration = count * self.starts[-1]
+        self.focus_count = count * self._focus_counts[-1]
+        self.focus_time = count * self._focus_times[-1]
+        if self.duration > MAX_TOTAL or self.length > MAX_TOTAL:
+            raise PatternError("Pattern is too long")
+
+    def intervals(self, offset=0):
+        """
+        Yields the intervals of the block starting with the one running
+        offset seconds into it.
+        """
+        repetition, position = divmod(offset, self.starts[-1])
+        index = bisect_right(self.starts, position) - 1
+        yield from self.items[index].intervals(position - self.starts[index])
+        for item in self.items[index + 1:]:
+            yield from item.intervals()
+        for _ in range(repetition + 1, self.count):
+            for item in self.items:
+                yield from item.intervals()
+
+    def locate(self, offset):
+        """
+        Returns (interval, start, index, focus_count, focus_time) for the
+        interval running offset seconds into the block, where start is
+        when it starts, index how many intervals come before it and
+        focus_count and focus_time the focus intervals before it.
+        """
+        repetition, position = divmod(offset, self.starts[-1])
+        index = bisect_right(self.starts, position) - 1
+        interval, start, before, focus_count, focus_time = self.items[index].locate(
+            position - self.starts[index]
+        )
+        return (
+            interval,
+            repetition * self.starts[-1] + self.starts[index] + start,
+            repetition * self._lengths[-1] + self._lengths[index] + before,
+            repetition * self._focus_counts[-1] + self._focus_counts[index] + focus_count,
+            repetition * self._focus_times[-1] + self._focus_times[index] + focus_time,
+        )
+
+    def leaves(self):
+        """
+        Yields every interval written in the pattern once, ignoring repeats.
+        """
+        for item in self.items:
+            yield from item.leaves()
+
+    def format(self, unit):
+        inner = ",".join(item.format(unit) for item in self.items)
+        if self.count == 1:
+            # Splicing an unrepeated group into its parent changes nothing
+            return inner
+        if len(self.items) == 1 and "," not in inner:
+            return f"{self.count}x{inner}"
+        return f"{self.count}x({inner})"
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.count}, {list(self.items)})"
+
+
+_TOKEN = re.compile(r"\s*(?:(\d+)|([xfb@(),]))", re.IGNORECASE)
+
+
+class _Parser:
+    def __init__(self, text, unit):
+        self.text = text
+        self.unit = unit
+        self.pos = 0
+        self.token = None
+        self.advance()
+
+    def advance(self):
+        self.token_pos = self.pos
+        if self.text[self.pos:].strip() == "":
+            self.token = None
+            return
+        match = _TOKEN.match(self.text, self.pos)
+        if match is None:
+            raise PatternError(f"Unexpected {self.text[self.pos:].strip()[0]!r} at {self.pos + 1}")
+        self.pos = match.end()
+        self.token = int(match.group(1)) if match.group(1) else match.group(2).lower()
+
+    def error(self, expected):
+        found = "end of pattern" if self.token is None else repr(str(self.token))
+        return PatternError(f"Expected {expected} at {self.token_pos + 1}, found {found}")
+
+    def number(self, expected):
+        if not isinstance(self.token, int):
+            raise self.error(expected)
+        if self.token > MAX_NUMBER:
+            raise PatternError(
+                f"{self.token} at {self.token_pos + 1} is too large, the limit is {MAX_NUMBER}"
+            )
+        value = self.token
+        self.advance()
+        return value
+
+    def sequence(self):
+        items = [self.item()]
+        while self.token == ",":
+            self.advance()
+            items.append(self.item())
+        return items
+
+    def item(self):
+        if self.token == "(":
+            return self.group(1)
+        value = self.number("a duration or repeat count")
+        if self.token == "x":
+            self.advance()
+            if self.token == "(":
+                return self.group(value)
+            return PatternBlock(value, [self.item()])
+        if self.token not in ("f", "b"):
+            raise self.error("'f' or 'b'")
+        is_break = self.token == "b"
+        self.advance()
+        reminder = 0
+        if self.token == "@":
+            self.advance()
+            reminder = self.number("a reminder number") - 1
+            if reminder < 0:
+                raise PatternError("Reminder numbers start at 1")
+        if value < 1:
+            raise PatternError("Interval durations must be positive")
+        return PatternInterval(value * self.unit, is_break, reminder)
+
+    def group(self, count):
+        self.advance()
+        items = self.sequence()
+        if self.token != ")":
+            raise self.error("')'")
+        self.advance()
+        return PatternBlock(count, items)
+
+
+def parse_pattern(text, unit=60):
+    """
+    Parses a pattern. Durations are written in minutes and returned in
+    units of 1 / unit minutes, i.e. seconds by default.
+    Raises PatternError if text is not a valid pattern.
+    """
+    parser = _Parser(text, unit)
+    if parser.token is None:
+        raise PatternError("Pattern is empty")
+    items = parser.sequence()
+    if parser.token is not None:
+        raise parser.error("',' or end of pattern")
+    return PatternBlock(1, items)
+
+
+def format_pattern(pattern, unit=60):
+    """
+    Returns the shortest text that parses back to pattern.
+    """
+    return ",".join(item.format(unit) for item in pattern.items)
+
+
+def pattern_errors(text, num_focus, num_break):
+    """
+    Checks a pattern written for a profile with num_focus focus and
+    num_break break intervals to pick reminders from.
+    Returns a list of problems, which is empty for a valid pattern.
+    """
+    try:
+        pattern = parse_pattern(text)
+    except PatternError as error:
+        return [str(error)]
+    errors = []
+    for interval in pattern.leaves():
+        available = num_break if interval.is_break else num_focus
+        if interval.reminder >= available:
+            kind = "break" if interval.is_break else "focus"
+            errors.append(
+                f"{interval.format(60)} uses reminder {interval.reminder + 1} "
+                f"but there are {available} {kind} intervals"
+            )
+    return errors
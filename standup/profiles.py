@@ -0,0 +1,1323 @@
+"""
+    Persistence for Stand Up session profiles.
+
+    Profiles live in a JSON snapshot (profiles.json) plus an append-only
+    journal next to it (profiles.journal).
+    Saving or deleting a profile appends one record to the journal, so the
+    cost of an edit depends on the size of that profile and not on the size
+    of the whole store. Reading replays the journal over the snapshot.
+    Once the journal grows past a threshold it is folded back into the
+    snapshot by a background compaction.
+
+    Every journal record is a single line of the form
+        <crc32 as hex> <json payload>
+    so a record that was only partially written when the program crashed is
+    detected and skipped on replay. Snapshots are written to a temporary file
+    and renamed over the old one so they are never left half written.
+
+    Several processes may use the same store. Reads hold a shared advisory
+    lock on profiles.lock and anything that writes holds it exclusively.
+
+    Stores record the schema version of their data. When a store written
+    by an older version is opened, the registered schema migrations newer
+    than its version run once and the store is saved with SCHEMA_VERSION,
+    so normal loads never have to check or repair profiles.
+
+    The GUI talks to profiles through a profile store (get_profile_store()).
+    JSONProfileStore wraps the functions in this module, SQLiteProfileStore
+    keeps profiles in an SQLite database next to profiles.json and
+    ShardedProfileStore keeps every profile in its own file.
+    The STANDUP_PROFILE_BACKEND environment variable picks which one is used.
+"""
+import contextlib
+import copy
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from standup import reminders
+from standup.patterns import pattern_errors
+from standup.serializers import (
+    ProfileFormatError,
+    dumps_profiles,
+    find_profile,
+    get_serializer,
+    loads_profiles,
+)
+
+
+# Version of the profile data written by this version of Stand Up
+SCHEMA_VERSION = 1
+
+# Compact when the journal is bigger than this or bigger than the snapshot,
+# whichever is larger, so the cost of compacting is amortised over the edits.
+JOURNAL_COMPACT_MIN_BYTES = 64 * 1024
+
+# Read once, as os.umask() can only be read by changing it
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+# Guards the cache and the bookkeeping below. It is never held across
+# file I/O or while waiting for a file lock, so a thread that writes to
+# the store does not hold up readers of the cache.
+_store_lock = threading.RLock()
+_compacting = set()
+# (thread id, lock file path) -> (file descriptor, exclusive) for the file
+# locks held by the threads of this process
+_held_file_locks = {}
+
+
+def get_profile_location():
+    home = os.getenv("HOME")
+    if home is None:
+        home = os.getenv("UserProfile")
+    filename = "profiles.json"
+    if sys.platform == "win32":
+        profile_path = os.path.join(home, "AppData", "Local", "standup", filename)
+    elif sys.platform.startswith("linux"):
+        profile_path = os.path.join(home, ".local", "share", "standup", filename)
+    elif sys.platform == "darwin": # Mac
+        profile_path = os.path.join(home, "Library", "Application Support", "standup", filename)
+    else:
+        profile_path = os.path.join(os.path.dirname(__file__), filename)
+    if profile_path:
+        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+    return profile_path
+
+
+def get_journal_location(filename):
+    return os.path.splitext(filename)[0] + ".journal"
+
+
+def get_index_location(filename):
+    return os.path.splitext(filename)[0] + ".index"
+
+
+def get_lock_location(filename):
+    return os.path.splitext(filename)[0] + ".lock"
+
+
+def _lock_fd(fd, exclusive):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+    # msvcrt only has exclusive locks, so on Windows readers take turns
+    # as well. It cannot wait for a lock either, so retry with a backoff.
+    os.lseek(fd, 0, os.SEEK_SET)
+    delay = 0.001
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(delay)
+            delay = min(2 * delay, 0.05)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def profile_file_lock(filename, exclusive=False):
+    """
+    Advisory lock on filename shared with other processes, taken on a
+    .lock file next to it.
+    Every thread takes its own lock on its own file descriptor, so threads
+    of one process exclude each other like separate processes do.
+    Locks taken while the thread already holds one on the same file reuse
+    the outer lock, but a shared lock cannot be upgraded to an exclusive one.
+    NOTE: on Windows every lock is exclusive, shared ones included.
+    """
+    path = os.path.abspath(get_lock_location(filename))
+    key = (threading.get_ident(), path)
+    with _store_lock:
+        held = _held_file_locks.get(key)
+    if held is not None:
+        if exclusive and not held[1]:
+            raise RuntimeError(f"Cannot upgrade shared lock on {path} to exclusive")
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock_fd(fd, exclusive)
+        with _store_lock:
+            _held_file_locks[key] = (fd, exclusive)
+        try:
+            yield
+        finally:
+            with _store_lock:
+                del _held_file_locks[key]
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def validate_reminder_types(profiles):
+    """
+    Checks profile data for invalid reminder types and fixes errors
+    ex: profile uses a reminder type that has been removed)
+    If an invalid reminder type is found it is replaced with 'None'
+    Returns True if any profile was changed.
+    """
+
+    changed = False
+    for profile in profiles:
+        for interval in profiles[profile]["focus_intervals"]:
+            if interval["reminder"]["name"] not in reminders.reminder_option_dict:
+                interval["reminder"]["name"] = "None"
+                changed = True
+        for interval in profiles[profile]["break_intervals"]:
+            if interval["reminder"]["name"] not in reminders.reminder_option_dict:
+                interval["reminder"]["name"] = "None"
+                changed = True
+    return changed
+
+
+# Fields every reminder type needs besides its name
+reminder_fields = {
+    "Open URL": {"url": str, "policy": int},
+    "Popup Window": {"message": str},
+}
+
+
+def profile_errors(profile):
+    """
+    Checks that profile has the shape the GUI expects.
+    Returns a list of problems, which is empty for a valid profile.
+    """
+    if not isinstance(profile, dict):
+        return ["profile is not an object"]
+    errors = []
+    session_duration = profile.get("session_duration")
+    if not isinstance(session_duration, int) or session_duration <= 0:
+        errors.append("session_duration must be a positive integer")
+    for queue in ("focus_intervals", "break_intervals"):
+        intervals = profile.get(queue)
+        if not isinstance(intervals, list):
+            errors.append(f"{queue} must be a list")
+            continue
+        for index, interval in enumerate(intervals):
+            where = f"{queue}[{index}]"
+            if not isinstance(interval, dict):
+                errors.append(f"{where} is not an object")
+                continue
+            duration = interval.get("duration")
+            if not isinstance(duration, int) or duration <= 0:
+                errors.append(f"{where}.duration must be a positive integer")
+            reminder = interval.get("reminder")
+            if not isinstance(reminder, dict):
+                errors.append(f"{where}.reminder is not an object")
+                continue
+            reminder_name = reminder.get("name")
+            if reminder_name not in reminders.reminder_option_dict:
+                errors.append(f"{where}.reminder has unknown type {reminder_name!r}")
+                continue
+            for field, field_type in reminder_fields.get(reminder_name, {}).items():
+                if not isinstance(reminder.get(field), field_type):
+                    errors.append(f"{where}.reminder.{field} must be a {field_type.__name__}")
+    pattern = profile.get("pattern")
+    if pattern is not None:
+        if not isinstance(pattern, str):
+            errors.append("pattern must be a string")
+        elif pattern and not errors:
+            errors += [
+                f"pattern: {error}"
+                for error in pattern_errors(
+                    pattern, len(profile["focus_intervals"]), len(profile["break_intervals"])
+                )
+            ]
+    return errors
+
+
+schema_migrations = {}
+
+
+def schema_migration(version):
+    """
+    Registers the decorated function as the step that upgrades profiles
+    from version - 1 to version. Steps change the profiles dict in place.
+    """
+    def register(migration):
+        schema_migrations[version] = migration
+        return migration
+    return register
+
+
+@schema_migration(1)
+def _replace_removed_reminder_types(profiles):
+    validate_reminder_types(profiles)
+
+
+def migrate_profiles(profiles, schema_version):
+    """
+    Runs each migration step newer than schema_version on profiles.
+    schema_version is None for a store that holds no data yet.
+    Returns True if any step ran, meaning the profiles have to be written
+    back so the store is stamped with the new version.
+    """
+    if schema_version is None or schema_version >= SCHEMA_VERSION:
+        return False
+    for version in range(schema_version + 1, SCHEMA_VERSION + 1):
+        schema_migrations[version](profiles)
+    return True
+
+
+class ProfileCache:
+    """
+    Process-wide cache of parsed profile files.
+    Entries are keyed on the file path and are only valid while the inode,
+    size and modification time of the snapshot and its journal match the
+    ones recorded when it was parsed, so a file changed on disk is always
+    reparsed.
+
+    Setting enabled to False turns the cache off, e.g. for a command that
+    streams the store once and should not keep all of it in memory.
+
+    NOTE: cached data is shared between callers. Anything that mutates it
+          must write it back with write_profiles() which refreshes the entry.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.enabled = True
+
+    @staticmethod
+    def _stat_key(filename):
+        key = []
+        for path in (filename, get_journal_location(filename)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                key.append(None)
+            else:
+                key.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        return tuple(key)
+
+    def get(self, filename):
+        if not self.enabled:
+            return None
+        filename = os.path.abspath(filename)
+        key = self._stat_key(filename)
+        with _store_lock:
+            entry = self._entries.get(filename)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def put(self, filename, profiles):
+        """
+        Caches profiles as the contents of filename. Callers hold a file
+        lock on it, so it cannot change until the entry is in place.
+        """
+        if not self.enabled:
+            return
+        filename = os.path.abspath(filename)
+        key = self._stat_key(filename)
+        with _store_lock:
+            self._entries[filename] = (key, profiles)
+
+    def invalidate(self, filename=None):
+        with _store_lock:
+            if filename is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(filename), None)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        with _store_lock:
+            self.invalidate()
+            self.hits = 0
+            self.misses = 0
+
+
+profile_cache = ProfileCache()
+
+
+def _encode_record(record):
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def _decode_record(line):
+    """
+    Returns the journal record stored in line or None if it is damaged.
+    """
+    checksum, _, payload = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _apply_record(profiles, record):
+    if record["op"] == "put":
+        profiles[record["name"]] = record["data"]
+    elif record["op"] == "delete":
+        profiles.pop(record["name"], None)
+
+
+def _migrate_record(record):
+    """
+    Upgrades the profile in a journal record written with an older schema.
+    Returns True if it had to be changed.
+    """
+    if record["op"] != "put":
+        return False
+    return migrate_profiles({record["name"]: record["data"]}, record.get("schema", 0))
+
+
+def _replay_journal(profiles, filename):
+    """
+    Applies the journal to profiles.
+    Returns True if some records had to be migrated.
+    """
+    migrated = False
+    try:
+        journal = open(get_journal_location(filename), "rb")
+    except FileNotFoundError:
+        return migrated
+    with journal:
+        for line in journal:
+            if not line.endswith(b"\n"):
+                break  # Torn write at the end of the journal
+            record = _decode_record(line)
+            if record is not None:
+                migrated = _migrate_record(record) or migrated
+                _apply_record(profiles, record)
+    return migrated
+
+
+def _append_records(filename, records):
+    """
+    Appends records to the journal with a single write and fsync.
+    Returns the new size of the journal.
+    """
+    with open(get_journal_location(filename), "ab+") as journal:
+        # If a previous append was torn, end that line first so the new
+        # record is not glued onto the damaged one.
+        if journal.tell() > 0:
+            journal.seek(-1, os.SEEK_END)
+            if journal.read(1) != b"\n":
+                journal.write(b"\n")
+        journal.write(b"".join(_encode_record(record) for record in records))
+        journal.flush()
+        os.fsync(journal.fileno())
+        return journal.tell()
+
+
+def _file_mode(filename):
+    """
+    Permissions for a new version of filename: those of the current file,
+    or what open() would give a new one.
+    """
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _atomic_write(filename, write, mode="w"):
+    """
+    Calls write(file) on a temporary file next to filename and renames it
+    over filename once the data is safely on disk. The new file keeps the
+    permissions of the one it replaces.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_name = tempfile.mkstemp(prefix=".profiles-", suffix=".tmp", dir=directory)
+    try:
+        # mkstemp() creates files only the owner can read
+        os.chmod(temp_name, _file_mode(filename))
+        with os.fdopen(fd, mode) as temp_file:
+            write(temp_file)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_name, filename)
+    except BaseException:
+        try:
+            os.remove(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+def read_profiles(filename=None):
+    """
+    Returns the dict of every profile in the store.
+    NOTE: the dict is shared with the profile cache and every other caller,
+          treat it as read-only. Use JSONProfileStore.read_all() or copy it
+          before making changes.
+    """
+    if filename is None:
+        filename = get_profile_location()
+    profiles = profile_cache.get(filename)
+    if profiles is not None:
+        return profiles
+    with profile_file_lock(filename):
+        # Another thread may have read it while this one waited for the lock
+        profiles = profile_cache.get(filename)
+        if profiles is not None:
+            return profiles
+        try:
+            with open(filename, "rb") as config:
+                schema_version, profiles = loads_profiles(config.read())
+        except (FileNotFoundError, ProfileFormatError, json.JSONDecodeError):
+            schema_version, profiles = None, {}
+        migrated = migrate_profiles(profiles, schema_version)
+        migrated = _replay_journal(profiles, filename) or migrated
+        if not migrated:
+            profile_cache.put(filename, profiles)
+            return profiles
+        parsed_key = ProfileCache._stat_key(filename)
+    # Only write the repaired data back if nobody changed the store
+    # since it was read, otherwise the next read repairs it again.
+    with profile_file_lock(filename, exclusive=True):
+        if ProfileCache._stat_key(filename) == parsed_key:
+            write_profiles(profiles, filename)
+    return profiles
+
+
+def _find_in_journal(profile_name, filename):
+    """
+    Returns (True, data) for the last journal record about profile_name,
+    data being None if the profile was deleted, or (False, None) if the
+    journal does not mention it.
+    Only lines that contain the name are decoded.
+    """
+    needle = b'"name":' + json.dumps(profile_name).encode("utf-8")
+    found, profile = False, None
+    try:
+        journal = open(get_journal_location(filename), "rb")
+    except FileNotFoundError:
+        return found, profile
+    with journal:
+        for line in journal:
+            if needle not in line or not line.endswith(b"\n"):
+                continue
+            record = _decode_record(line)
+            if record is not None and record["name"] == profile_name:
+                _migrate_record(record)
+                found, profile = True, record.get("data")
+    return found, profile
+
+
+def _write_index(filename, index):
+    """
+    Stores the byte range of every profile in the snapshot, together with
+    the identity of the snapshot file so a stale index is never used.
+    """
+    index_filename = get_index_location(filename)
+    if index is None:
+        if os.path.exists(index_filename):
+            os.remove(index_filename)
+        return
+    st = os.stat(filename)
+    encoded = json.dumps(
+        {
+            "snapshot": [st.st_ino, st.st_size, st.st_mtime_ns],
+            "schema_version": SCHEMA_VERSION,
+            "profiles": index,
+        },
+        separators=(",", ":"),
+    )
+    _atomic_write(index_filename, lambda index_file: index_file.write(encoded))
+
+
+def _read_index(filename, st):
+    try:
+        with open(get_index_location(filename), "r") as index_file:
+            index = json.load(index_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if index.get("snapshot") != [st.st_ino, st.st_size, st.st_mtime_ns]:
+        return None
+    return index
+
+
+def _find_in_snapshot(profile_name, filename):
+    """
+    Memory-maps the snapshot and decodes only the profile asked for.
+    The byte range of the profile comes from the index written next to the
+    snapshot. If the index is missing or stale the snapshot is scanned for
+    the profile instead.
+    Returns (schema_version, profile).
+    Raises ProfileFormatError if the snapshot cannot be scanned (e.g. the
+    binary format) and has to be read in full.
+    """
+    try:
+        snapshot = open(filename, "rb")
+    except FileNotFoundError:
+        return None, None
+    with snapshot:
+        st = os.fstat(snapshot.fileno())
+        if st.st_size == 0:
+            return None, None
+        index = _read_index(filename, st)
+        with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            try:
+                if index is not None:
+                    if profile_name not in index["profiles"]:
+                        return None, None
+                    start, end = index["profiles"][profile_name]
+                    return index["schema_version"], json.loads(buffer[start:end])
+                schema_version, _, profile = find_profile(buffer, profile_name)
+                return schema_version, profile
+            except json.JSONDecodeError as e:
+                raise ProfileFormatError(str(e)) from e
+
+
+def load_profile(profile_name: str, filename=None):
+    """
+    Returns a single profile. If the store is not cached yet only that
+    profile is decoded instead of parsing the whole store.
+    NOTE: like read_profiles() the result may be the cached profile itself,
+          treat it as read-only.
+    """
+    if filename is None:
+        filename = get_profile_location()
+    profiles = profile_cache.get(filename)
+    if profiles is not None:
+        return profiles.get(profile_name)
+    with profile_file_lock(filename):
+        found, profile = _find_in_journal(profile_name, filename)
+        if found:
+            return profile
+        try:
+            schema_version, profile = _find_in_snapshot(profile_name, filename)
+        except ProfileFormatError:
+            pass
+        else:
+            if profile is not None:
+                migrate_profiles({profile_name: profile}, schema_version)
+            return profile
+    # read_profiles() may write the migrated store back, which takes
+    # the exclusive lock, so the shared one has to be released first
+    return read_profiles(filename).get(profile_name)
+
+
+def _index_journal(journal):
+    """
+    Returns a dict mapping every profile named in the journal to the offset
+    of its last record, or to None if that record deletes it.
+    """
+    offsets = {}
+    offset = 0
+    for line in journal:
+        if not line.endswith(b"\n"):
+            break  # Torn write at the end of the journal
+        record = _decode_record(line)
+        if record is not None:
+            offsets[record["name"]] = offset if record["op"] == "put" else None
+        offset += len(line)
+    return offsets
+
+
+def _read_journal_profile(journal, offset):
+    journal.seek(offset)
+    record = _decode_record(journal.readline())
+    _migrate_record(record)
+    return record["data"]
+
+
+def profile_names(filename=None):
+    """
+    Returns the names of the stored profiles in the order iter_profiles()
+    yields them. The names come from the cache, or from the snapshot index
+    and the journal without decoding any profile. Only a store without an
+    index (e.g. the binary format) is read in full.
+    """
+    if filename is None:
+        filename = get_profile_location()
+    profiles = profile_cache.get(filename)
+    if profiles is not None:
+        return list(profiles)
+    with profile_file_lock(filename):
+        try:
+            with open(get_journal_location(filename), "rb") as journal:
+                journal_offsets = _index_journal(journal)
+        except FileNotFoundError:
+            journal_offsets = {}
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_size == 0:
+            index = {"profiles": {}}
+        else:
+            index = _read_index(filename, st)
+        if index is not None:
+            # Offset None means the journal deleted the profile
+            names = [
+                profile_name for profile_name in index["profiles"]
+                if journal_offsets.get(profile_name, 0) is not None
+            ]
+            names += [
+                profile_name for profile_name, offset in journal_offsets.items()
+                if offset is not None and profile_name not in index["profiles"]
+            ]
+            return names
+    # Outside the shared lock, see iter_profiles()
+    return list(read_profiles(filename))
+
+
+def iter_profiles(filename=None):
+    """
+    Yields (name, profile) for every stored profile in the order
+    read_profiles() would return them.
+    When the snapshot has an index, profiles are decoded one at a time so
+    memory use does not grow with the size of the store. Otherwise (e.g.
+    the binary format) the whole store is read.
+    NOTE: holds a shared lock on the store until the iteration finishes,
+          so nothing may write to the store while iterating.
+    """
+    if filename is None:
+        filename = get_profile_location()
+    if (yield from _iter_indexed_profiles(filename)):
+        return
+    # Without an index the store is read in full. Outside the shared lock,
+    # as read_profiles() may take the exclusive one to write back a migration.
+    yield from list(read_profiles(filename).items())
+
+
+def _iter_indexed_profiles(filename):
+    """
+    Yields the profiles of iter_profiles() if the store is cached or its
+    snapshot has an index. Returns False, having yielded nothing, otherwise.
+    """
+    with profile_file_lock(filename):
+        profiles = profile_cache.get(filename)
+        if profiles is not None:
+            yield from list(profiles.items())
+            return True
+        with contextlib.ExitStack() as stack:
+            try:
+                journal = stack.enter_context(open(get_journal_location(filename), "rb"))
+                journal_offsets = _index_journal(journal)
+            except FileNotFoundError:
+                journal, journal_offsets = None, {}
+            try:
+                snapshot = stack.enter_context(open(filename, "rb"))
+                st = os.fstat(snapshot.fileno())
+            except FileNotFoundError:
+                st = None
+            if st is None or st.st_size == 0:
+                index = {"profiles": {}}
+            else:
+                index = _read_index(filename, st)
+            if index is None:
+                return False
+            buffer = None
+            if index["profiles"]:
+                buffer = stack.enter_context(
+                    mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+            for profile_name, (start, end) in index["profiles"].items():
+                if profile_name not in journal_offsets:
+                    yield profile_name, json.loads(buffer[start:end])
+                elif journal_offsets[profile_name] is not None:
+                    yield profile_name, _read_journal_profile(
+                        journal, journal_offsets[profile_name]
+                    )
+            for profile_name, offset in journal_offsets.items():
+                if offset is not None and profile_name not in index["profiles"]:
+                    yield profile_name, _read_journal_profile(journal, offset)
+    return True
+
+
+def write_profiles(data, filename=None, fmt=None):
+    """
+    Replaces the whole store with data.
+    The snapshot is swapped in atomically and the journal is emptied
+    since everything in it is now part of the snapshot.
+    fmt names a format from standup.serializers, by default the one set
+    by STANDUP_PROFILE_FORMAT.
+    """
+    if filename is None:
+        filename = get_profile_location()
+    with profile_file_lock(filename, exclusive=True):
+        try:
+            _write_snapshot(filename, data.items(), fmt)
+        except Exception:
+            profile_cache.invalidate(filename)
+            raise
+        profile_cache.put(filename, data)
+
+
+def _write_snapshot(filename, items, fmt=None):
+    """
+    Writes the (name, profile) pairs of the iterable items as the new
+    snapshot, one profile at a time if the format allows, and empties the
+    journal. The caller holds the exclusive lock.
+    """
+    serializer = get_serializer(fmt)
+    index = None
+
+    def write(snapshot):
+        nonlocal index
+        index = serializer.dump_indexed(items, SCHEMA_VERSION, snapshot)
+
+    _atomic_write(filename, write, "wb")
+    journal = get_journal_location(filename)
+    if os.path.exists(journal):
+        os.truncate(journal, 0)
+    _write_index(filename, index)
+
+
+def export_profiles(destination, filename=None):
+    """
+    Writes every profile to destination as indented JSON for people to
+    read or edit. Any file in a supported format can be read back with
+    read_profiles().
+    """
+    encoded = dumps_profiles(read_profiles(filename), SCHEMA_VERSION, "json")
+    _atomic_write(destination, lambda export: export.write(encoded), "wb")
+
+
+def _log_changes(filename, records):
+    if filename is None:
+        filename = get_profile_location()
+    with profile_file_lock(filename, exclusive=True):
+        # The cached copy is only updated when it is known to include
+        # every change made by other processes before this one.
+        profiles = profile_cache.get(filename)
+        try:
+            journal_size = _append_records(filename, records)
+        except Exception:
+            profile_cache.invalidate(filename)
+            raise
+        if profiles is not None:
+            # Changed on a copy, as other threads may be iterating over
+            # the cached dict without holding any lock
+            profiles = dict(profiles)
+            for record in records:
+                _apply_record(profiles, record)
+            profile_cache.put(filename, profiles)
+        else:
+            profile_cache.invalidate(filename)
+        try:
+            snapshot_size = os.path.getsize(filename)
+        except OSError:
+            snapshot_size = 0
+    if journal_size > max(JOURNAL_COMPACT_MIN_BYTES, snapshot_size):
+        compact_profiles_in_background(filename)
+
+
+def _change_record(profile_name, data):
+    if data is None:
+        return {"op": "delete", "name": profile_name}
+    return {"op": "put", "name": profile_name, "data": data, "schema": SCHEMA_VERSION}
+
+
+def save_profile(profile_name: str, data: dict, filename=None):
+    _log_changes(filename, [_change_record(profile_name, data)])
+
+
+def delete_profile(profile_name, filename=None):
+    _log_changes(filename, [_change_record(profile_name, None)])
+
+
+def apply_profile_changes(changes, filename=None):
+    """
+    Saves several profiles in one journal write.
+    changes maps profile names to their new data, or to None to delete them.
+    """
+    if changes:
+        _log_changes(filename, [_change_record(name, data) for name, data in changes.items()])
+
+
+def compact_profiles(filename=None):
+    """
+    Folds the journal into the snapshot.
+    A crash at any point leaves either the old snapshot with the full
+    journal or the new snapshot with a journal whose records are already
+    part of it. Replaying those again gives the same result.
+    Profiles are streamed from the old snapshot and the journal into the
+    new one, so unless the store is cached anyway it is never all in memory.
+    """
+    if filename is None:
+        filename = get_profile_location()
+    with profile_file_lock(filename, exclusive=True):
+        profiles = profile_cache.get(filename)
+        try:
+            _write_snapshot(filename, iter_profiles(filename))
+        except Exception:
+            profile_cache.invalidate(filename)
+            raise
+        if profiles is not None:
+            # Same profiles, new files
+            profile_cache.put(filename, profiles)
+
+
+def compact_profiles_in_background(filename=None):
+    if filename is None:
+        filename = get_profile_location()
+    filename = os.path.abspath(filename)
+    with _store_lock:
+        if filename in _compacting:
+            return None
+        _compacting.add(filename)
+
+    def run():
+        try:
+            compact_profiles(filename)
+        finally:
+            with _store_lock:
+                _compacting.discard(filename)
+
+    worker = threading.Thread(target=run, name="standup-compaction", daemon=True)
+    worker.start()
+    return worker
+
+
+class JSONProfileStore:
+    """
+    Profile store backed by profiles.json and its journal.
+    """
+
+    name = "json"
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = get_profile_location()
+        self.filename = filename
+
+    def names(self):
+        return profile_names(self.filename)
+
+    def name_taken(self, profile_name):
+        profile_name = profile_name.lower()
+        return any(name.lower() == profile_name for name in profile_names(self.filename))
+
+    def load(self, profile_name):
+        # Callers own what the store returns, as with the other stores
+        return copy.deepcopy(load_profile(profile_name, self.filename))
+
+    def save(self, profile_name, data):
+        save_profile(profile_name, data, self.filename)
+
+    def delete(self, profile_name):
+        delete_profile(profile_name, self.filename)
+
+    def apply_changes(self, changes):
+        apply_profile_changes(changes, self.filename)
+
+    def read_all(self):
+        return copy.deepcopy(read_profiles(self.filename))
+
+    def iter_profiles(self):
+        return iter_profiles(self.filename)
+
+    def write_all(self, profiles):
+        write_profiles(profiles, self.filename)
+
+    def watch_paths(self):
+        """
+        Files and directories whose changes can change the stored profiles.
+        """
+        return [
+            self.filename,
+            get_journal_location(self.filename),
+            os.path.dirname(os.path.abspath(self.filename)),
+        ]
+
+
+class SQLiteProfileStore:
+    """
+    Profile store backed by an SQLite database.
+    Profile names have a case-insensitive unique index, so looking up one
+    profile or checking whether a name is taken does not touch the others.
+    The first time the database is opened it imports profiles.json, and
+    self.json_import_skipped lists the names import_profiles() skipped,
+    None if nothing was imported.
+    """
+
+    name = "sqlite"
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS profiles_name
+            ON profiles (name COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value
+        );
+    """
+
+    def __init__(self, filename=None, json_filename=None):
+        if json_filename is None:
+            json_filename = get_profile_location()
+        if filename is None:
+            filename = get_sqlite_location(json_filename)
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self.json_import_skipped = None
+        with self._lock, self._db:
+            self._db.executescript(self._SCHEMA)
+            (user_version,) = self._db.execute("PRAGMA user_version").fetchone()
+            if user_version == 0:
+                self.json_import_skipped = self.import_profiles(read_profiles(json_filename))
+                self._db.execute("PRAGMA user_version = 1")
+                self._set_schema_version(SCHEMA_VERSION)
+            schema_version = self._get_schema_version()
+            if schema_version < SCHEMA_VERSION:
+                profiles = self.read_all()
+                migrate_profiles(profiles, schema_version)
+                self.write_all(profiles)
+                self._set_schema_version(SCHEMA_VERSION)
+
+    def _get_schema_version(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        return 0 if row is None else row[0]
+
+    def _set_schema_version(self, schema_version):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+            (schema_version,),
+        )
+
+    def close(self):
+        self._db.close()
+
+    def names(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT name FROM profiles ORDER BY id")]
+
+    def name_taken(self, profile_name):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM profiles WHERE name = ? COLLATE NOCASE", (profile_name,)
+            ).fetchone()
+        return row is not None
+
+    def load(self, profile_name):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM profiles WHERE name = ? COLLATE NOCASE", (profile_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, profile_name, data):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO profiles (name, data) VALUES (?, ?) "
+                "ON CONFLICT (name COLLATE NOCASE) DO UPDATE SET data = excluded.data",
+                (profile_name, json.dumps(data, separators=(",", ":"))),
+            )
+
+    def delete(self, profile_name):
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM profiles WHERE name = ? COLLATE NOCASE", (profile_name,)
+            )
+
+    def apply_changes(self, changes):
+        deleted = [(name,) for name, data in changes.items() if data is None]
+        saved = [
+            (name, json.dumps(data, separators=(",", ":")))
+            for name, data in changes.items() if data is not None
+        ]
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM profiles WHERE name = ? COLLATE NOCASE", deleted
+            )
+            self._db.executemany(
+                "INSERT INTO profiles (name, data) VALUES (?, ?) "
+                "ON CONFLICT (name COLLATE NOCASE) DO UPDATE SET data = excluded.data",
+                saved,
+            )
+
+    def read_all(self):
+        with self._lock:
+            rows = self._db.execute("SELECT name, data FROM profiles ORDER BY id").fetchall()
+        return {name: json.loads(data) for name, data in rows}
+
+    def iter_profiles(self, page_size=500):
+        """
+        Yields (name, profile) for every profile, fetching page_size rows
+        at a time.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, name, data FROM profiles WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, page_size),
+                ).fetchall()
+            for last_id, profile_name, data in rows:
+                yield profile_name, json.loads(data)
+            if len(rows) < page_size:
+                return
+
+    def write_all(self, profiles):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM profiles")
+            self.import_profiles(profiles)
+
+    def import_profiles(self, profiles):
+        """
+        Adds profiles to the database.
+        Names that only differ by case from one already stored are skipped
+        and returned.
+        """
+        skipped = []
+        with self._lock, self._db:
+            for profile_name, data in profiles.items():
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO profiles (name, data) VALUES (?, ?)",
+                    (profile_name, json.dumps(data, separators=(",", ":"))),
+                )
+                if cursor.rowcount == 0:
+                    skipped.append(profile_name)
+        return skipped
+
+    def watch_paths(self):
+        return [
+            self.filename,
+            self.filename + "-wal",
+            os.path.dirname(os.path.abspath(self.filename)),
+        ]
+
+
+def get_sqlite_location(json_filename=None):
+    if json_filename is None:
+        json_filename = get_profile_location()
+    return os.path.splitext(json_filename)[0] + ".sqlite3"
+
+
+def migrate_json_to_sqlite(json_filename=None, sqlite_filename=None):
+    """
+    Copies every profile from profiles.json into the SQLite database.
+    Returns the names that were not copied because a profile with the
+    same name (ignoring case) already exists in the database.
+    """
+    store = SQLiteProfileStore(sqlite_filename, json_filename)
+    try:
+        if store.json_import_skipped is not None:
+            # A new database, which imported profiles.json when it was created
+            return store.json_import_skipped
+        return store.import_profiles(read_profiles(json_filename))
+    finally:
+        store.close()
+
+
+class ShardedProfileStore:
+    """
+    Profile store that keeps every profile in its own file.
+
+    The files live in a profiles/ directory next to profiles.json and are
+    named after the hash of their contents. manifest.json maps each profile
+    name to the hash of its file, so listing profiles only reads the manifest
+    and loading one only parses that profile's file.
+
+    A save writes the new profile file first and then swaps in a new manifest,
+    so a crash leaves either the old or the new version of the profile.
+    Files no longer referenced by the manifest are removed afterwards.
+    """
+
+    name = "sharded"
+
+    def __init__(self, directory=None, json_filename=None):
+        if json_filename is None:
+            json_filename = get_profile_location()
+        if directory is None:
+            directory = get_shard_location(json_filename)
+        self.directory = directory
+        self.manifest_filename = os.path.join(directory, "manifest.json")
+        self._lock = threading.RLock()
+        self._manifest = None
+        self._manifest_key = None
+        self._manifest_version = None
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, profile_file_lock(self.manifest_filename, exclusive=True):
+            if not os.path.exists(self.manifest_filename):
+                self.write_all(read_profiles(json_filename))
+            self._read_manifest()
+            if self._manifest_version < SCHEMA_VERSION:
+                schema_version = self._manifest_version
+                profiles = self.read_all()
+                migrate_profiles(profiles, schema_version)
+                self.write_all(profiles)
+
+    def _shard_filename(self, digest):
+        return os.path.join(self.directory, digest + ".json")
+
+    def _read_manifest(self):
+        """
+        Returns the manifest, read again if the file changed.
+        Raises ProfileFormatError if it is damaged. It cannot be rebuilt
+        from the profile files, which do not hold the names, and treating
+        it as empty would orphan every profile on the next save.
+        """
+        try:
+            st = os.stat(self.manifest_filename)
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            key = None
+        if self._manifest is None or key != self._manifest_key:
+            try:
+                with open(self.manifest_filename, "rb") as manifest_file:
+                    manifest = json.load(manifest_file)
+                profiles = manifest["profiles"]
+                schema_version = manifest.get("schema_version", 0)
+                if not isinstance(profiles, dict) or not isinstance(schema_version, int):
+                    raise TypeError("wrong type")
+            except FileNotFoundError:
+                profiles, schema_version = {}, SCHEMA_VERSION
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ProfileFormatError(
+                    f"Profile manifest {self.manifest_filename} is damaged: {e}"
+                ) from e
+            self._manifest = profiles
+            self._manifest_version = schema_version
+            self._manifest_key = key
+        return self._manifest
+
+    def _write_manifest(self, manifest):
+        _atomic_write(
+            self.manifest_filename,
+            lambda manifest_file: json.dump(
+                {"schema_version": SCHEMA_VERSION, "profiles": manifest}, manifest_file
+            ),
+        )
+        self._manifest = manifest
+        self._manifest_version = SCHEMA_VERSION
+        st = os.stat(self.manifest_filename)
+        self._manifest_key = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _write_shard(self, data):
+        encoded = json.dumps(data, separators=(",", ":"))
+        digest = hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+        shard_filename = self._shard_filename(digest)
+        if not os.path.exists(shard_filename):
+            _atomic_write(shard_filename, lambda shard_file: shard_file.write(encoded))
+        return digest
+
+    def _remove_unused_shards(self, digests):
+        in_use = set(self._read_manifest().values())
+        for digest in set(digests) - in_use:
+            try:
+                os.remove(self._shard_filename(digest))
+            except OSError:
+                pass
+
+    def names(self):
+        with self._lock:
+            return list(self._read_manifest())
+
+    def name_taken(self, profile_name):
+        profile_name = profile_name.lower()
+        with self._lock:
+            return any(name.lower() == profile_name for name in self._read_manifest())
+
+    def load(self, profile_name):
+        with self._lock:
+            digest = self._read_manifest().get(profile_name)
+            if digest is None:
+                return None
+            with open(self._shard_filename(digest), "r") as shard_file:
+                return json.load(shard_file)
+
+    def save(self, profile_name, data):
+        self.apply_changes({profile_name: data})
+
+    def delete(self, profile_name):
+        self.apply_changes({profile_name: None})
+
+    def apply_changes(self, changes):
+        with self._lock, profile_file_lock(self.manifest_filename, exclusive=True):
+            manifest = dict(self._read_manifest())
+            old_digests = [manifest[name] for name in changes if name in manifest]
+            for profile_name, data in changes.items():
+                if data is None:
+                    manifest.pop(profile_name, None)
+                else:
+                    manifest[profile_name] = self._write_shard(data)
+            self._write_manifest(manifest)
+            self._remove_unused_shards(old_digests)
+
+    def read_all(self):
+        with self._lock:
+            profiles = {name: self.load(name) for name in self.names()}
+        return profiles
+
+    def iter_profiles(self):
+        with self._lock:
+            manifest = dict(self._read_manifest())
+        for profile_name, digest in manifest.items():
+            with open(self._shard_filename(digest), "r") as shard_file:
+                yield profile_name, json.load(shard_file)
+
+    def write_all(self, profiles):
+        with self._lock, profile_file_lock(self.manifest_filename, exclusive=True):
+            old_digests = list(self._read_manifest().values())
+            manifest = {name: self._write_shard(data) for name, data in profiles.items()}
+            self._write_manifest(manifest)
+            self._remove_unused_shards(old_digests)
+
+    def watch_paths(self):
+        return [self.manifest_filename, self.directory]
+
+
+def get_shard_location(json_filename=None):
+    if json_filename is None:
+        json_filename = get_profile_location()
+    return os.path.join(os.path.dirname(json_filename), "profiles")
+
+
+profile_backends = {
+    backend.name: backend
+    for backend in (JSONProfileStore, SQLiteProfileStore, ShardedProfileStore)
+}
+
+_profile_store = None
+
+
+def get_profile_store():
+    """
+    Returns the process-wide profile store picked by the
+    STANDUP_PROFILE_BACKEND environment variable (default: json).
+    """
+    global _profile_store
+    if _profile_store is None:
+        backend = os.getenv("STANDUP_PROFILE_BACKEND", JSONProfileStore.name)
+        if backend not in profile_backends:
+            raise ValueError(
+                f"Unknown profile backend {backend!r}, "
+                f"expected one of {', '.join(profile_backends)}"
+            )
+        _profile_store = profile_backends[backend]()
+    return _profile_store
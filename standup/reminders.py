@@ -28,6 +28,7 @@
 """
 
 import webbrowser
+import weakref
 import PySide6.QtWidgets as qw
 from PySide6.QtCore import Qt
 
@@ -163,7 +164,7 @@ class BrowserReminderOptions(ReminderOptions):
     def getReminder(self):
         url = self.url_input.text()
         policy = self.policy_group.checkedId()
-        return BrowserReminder(url, policy)
+        return shared_reminder(BrowserReminder, url, policy)
 
 
 class PopupWindowReminderOptions(MessageReminderOptions, ReminderOptions):
@@ -176,7 +177,7 @@ class PopupWindowReminderOptions(MessageReminderOptions, ReminderOptions):
         self.message_input.setText(data["message"])
 
     def getReminder(self):
-        return PopupWindowReminder(self.message_input.text())
+        return shared_reminder(PopupWindowReminder, self.message_input.text())
 
 
 ### NOTE: Reminders that raise the window do not seem to work on Linux so I am just removing them for now.
@@ -216,6 +217,13 @@ class PopupWindowReminderOptions(MessageReminderOptions, ReminderOptions):
 
 
 class Reminder:
+    """
+    Reminders never change once they are made, so identical reminders are
+    shared between intervals, see shared_reminder().
+    """
+
+    __slots__ = ("__weakref__",)
+
     def trigger(self):
         raise NotImplementedError
 
@@ -223,7 +231,24 @@ class Reminder:
         return f"{self.__class__.__name__}()"
 
 
+_shared_reminders = weakref.WeakValueDictionary()
+
+
+def shared_reminder(reminder_class, *args):
+    """
+    Returns reminder_class(*args), reusing an identical reminder if one is
+    still in use.
+    """
+    key = (reminder_class, args)
+    reminder = _shared_reminders.get(key)
+    if reminder is None:
+        reminder = reminder_class(*args)
+        _shared_reminders[key] = reminder
+    return reminder
+
+
 class BrowserReminder(Reminder):
+    __slots__ = ("url", "policy")
     message = "Opening URL..."
 
     def __init__(self, url, policy):
@@ -239,6 +264,9 @@ class BrowserReminder(Reminder):
         webbrowser.open(self.url, new=self.policy)
         return False
 
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.url!r}, {self.policy})"
+
 
 #class RaiseWindowReminder(Reminder):
 #    def __init__(self, message, window):
@@ -270,6 +298,8 @@ class BrowserReminder(Reminder):
 #        return False
 
 class PopupWindowReminder(Reminder):
+    __slots__ = ("message",)
+
     def __init__(self, message):
         super().__init__()
         self.message = message
@@ -282,6 +312,9 @@ class PopupWindowReminder(Reminder):
         popup.setText(self.message)
         response = popup.exec()
         return popup.clickedButton() == continue_button
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.message!r})"
         
 
 
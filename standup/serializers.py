@@ -0,0 +1,330 @@
+"""
+    File formats for the profile snapshot (profiles.json).
+
+    Every format turns the dict of profiles into bytes and back.
+    When reading, the format is detected from the first bytes of the file so
+    a store can switch formats without any conversion step.
+
+    The profiles are stored in an envelope that records the schema version
+    of the data: {"schema_version": 1, "profiles": {...}}.
+    Files written before schema versions existed hold the profiles at the
+    top level and are read as version 0.
+
+    Formats:
+        json         - indented JSON, meant for people to read and edit.
+                       Used by export_profiles().
+        json-compact - JSON without whitespace. Smaller and quicker to parse.
+        binary       - marshal encoded data behind a small versioned header
+                       with a checksum. The quickest to load and save.
+"""
+import io
+import json
+import marshal
+import os
+import re
+import struct
+import zlib
+
+
+class ProfileFormatError(ValueError):
+    pass
+
+
+def wrap_profiles(profiles, schema_version):
+    return {"schema_version": schema_version, "profiles": profiles}
+
+
+def unwrap_profiles(document):
+    """
+    Returns (schema_version, profiles) for a decoded profile file.
+    """
+    schema_version = document.get("schema_version")
+    if isinstance(schema_version, int) and isinstance(document.get("profiles"), dict):
+        return schema_version, document["profiles"]
+    return 0, document
+
+
+class ProfileSerializer:
+    name = "Base Class"
+
+    def dumps(self, profiles, schema_version):
+        raise NotImplementedError
+
+    def dumps_indexed(self, profiles, schema_version):
+        """
+        Returns the encoded profiles and a dict mapping each profile name to
+        the (start, end) byte range of its value, or None if the format
+        cannot be read one profile at a time.
+        """
+        return self.dumps(profiles, schema_version), None
+
+    def dump_indexed(self, items, schema_version, output):
+        """
+        Writes the (name, profile) pairs of the iterable items to the binary
+        file output and returns the index like dumps_indexed().
+        Formats that can be read one profile at a time are also written one
+        profile at a time, the others collect every profile first.
+        """
+        encoded, index = self.dumps_indexed(dict(items), schema_version)
+        output.write(encoded)
+        return index
+
+    def loads(self, data):
+        """
+        Returns the decoded file, use unwrap_profiles() to get the profiles.
+        """
+        raise NotImplementedError
+
+    def detect(self, data):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class PrettyJSONSerializer(ProfileSerializer):
+    name = "json"
+    _OPEN = b'{\n  "schema_version": %d,\n  "profiles": {\n    '
+    _SEPARATOR, _CLOSE = b",\n    ", b"\n  }\n}"
+    _KEY_SEPARATOR = ": "
+
+    def dumps(self, profiles, schema_version):
+        return json.dumps(wrap_profiles(profiles, schema_version), indent="  ").encode("utf-8")
+
+    def _dumps_value(self, value):
+        # Profiles sit two levels deep in the envelope.
+        # JSON strings never contain raw newlines so this only touches indentation.
+        return json.dumps(value, indent="  ").replace("\n", "\n    ")
+
+    def dumps_indexed(self, profiles, schema_version):
+        output = io.BytesIO()
+        index = self.dump_indexed(profiles.items(), schema_version, output)
+        return output.getvalue(), index
+
+    def dump_indexed(self, items, schema_version, output):
+        index = {}
+        pos = 0
+        separator = self._OPEN % schema_version
+        for profile_name, profile in items:
+            key = (json.dumps(profile_name) + self._KEY_SEPARATOR).encode("utf-8")
+            value = self._dumps_value(profile).encode("utf-8")
+            pos += len(separator) + len(key)
+            index[profile_name] = (pos, pos + len(value))
+            pos += len(value)
+            output.write(separator)
+            output.write(key)
+            output.write(value)
+            separator = self._SEPARATOR
+        if not index:
+            output.write(self.dumps({}, schema_version))
+        else:
+            output.write(self._CLOSE)
+        return index
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def detect(self, data):
+        return data.lstrip()[:1] == b"{"
+
+
+class CompactJSONSerializer(PrettyJSONSerializer):
+    name = "json-compact"
+
+    _OPEN = b'{"schema_version":%d,"profiles":{'
+    _SEPARATOR, _CLOSE = b",", b"}}"
+    _KEY_SEPARATOR = ":"
+
+    def dumps(self, profiles, schema_version):
+        return json.dumps(
+            wrap_profiles(profiles, schema_version), separators=(",", ":")
+        ).encode("utf-8")
+
+    def _dumps_value(self, value):
+        return json.dumps(value, separators=(",", ":"))
+
+
+class BinarySerializer(ProfileSerializer):
+    """
+    Header: magic (4 bytes), format version (uint16), crc32 of the payload
+    (uint32), all big endian, followed by the marshal encoded profiles.
+
+    NOTE: marshal is only safe for data we wrote ourselves, never load
+          profile files from an untrusted source in this format.
+    """
+
+    name = "binary"
+    MAGIC = b"SUPB"
+    VERSION = 1
+    _HEADER = struct.Struct(">4sHI")
+
+    def dumps(self, profiles, schema_version):
+        payload = marshal.dumps(wrap_profiles(profiles, schema_version), 4)
+        return self._HEADER.pack(self.MAGIC, self.VERSION, zlib.crc32(payload)) + payload
+
+    def loads(self, data):
+        if len(data) < self._HEADER.size:
+            raise ProfileFormatError("Binary profile file is truncated")
+        magic, version, checksum = self._HEADER.unpack_from(data)
+        if version != self.VERSION:
+            raise ProfileFormatError(f"Unsupported binary profile version {version}")
+        payload = memoryview(data)[self._HEADER.size:]
+        if zlib.crc32(payload) != checksum:
+            raise ProfileFormatError("Binary profile file is damaged")
+        return marshal.loads(payload)
+
+    def detect(self, data):
+        return data[:len(self.MAGIC)] == self.MAGIC
+
+
+profile_serializers = {
+    serializer.name: serializer
+    for serializer in (PrettyJSONSerializer(), CompactJSONSerializer(), BinarySerializer())
+}
+
+DEFAULT_FORMAT = CompactJSONSerializer.name
+
+
+def get_serializer(name=None):
+    """
+    Returns the serializer called name, or the one picked by the
+    STANDUP_PROFILE_FORMAT environment variable (default: json-compact).
+    """
+    if name is None:
+        name = os.getenv("STANDUP_PROFILE_FORMAT", DEFAULT_FORMAT)
+    try:
+        return profile_serializers[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown profile format {name!r}, "
+            f"expected one of {', '.join(profile_serializers)}"
+        ) from None
+
+
+def detect_serializer(data):
+    for serializer in profile_serializers.values():
+        if serializer.detect(data):
+            return serializer
+    raise ProfileFormatError("Unknown profile file format")
+
+
+def loads_profiles(data):
+    """
+    Decodes a profile file in any known format.
+    Returns (schema_version, profiles). Empty files hold no profiles.
+    """
+    if not data or data.isspace():
+        return None, {}
+    return unwrap_profiles(detect_serializer(data).loads(data))
+
+
+def dumps_profiles(profiles, schema_version, name=None):
+    return get_serializer(name).dumps(profiles, schema_version)
+
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(rb"[^,:{}\[\]\s]+")
+# Matches everything up to and including the next bracket that is not inside
+# a string, so there is one match per bracket. Group 1 is the bracket.
+# One character per repetition outside strings: a "+" nested in the "*"
+# backtracks exponentially when there is no bracket left, e.g. in a
+# truncated file.
+_BRACKET = re.compile(rb'(?:[^"{}\[\]]|"(?:[^"\\]|\\.)*")*([{}\[\]])', re.DOTALL)
+
+
+def _skip_whitespace(buffer, pos):
+    return _WHITESPACE.match(buffer, pos).end()
+
+
+def _skip_value(buffer, pos):
+    """
+    Returns the index just past the JSON value that starts at pos
+    without decoding it.
+    """
+    first = buffer[pos:pos + 1]
+    if first == b'"':
+        match = _STRING.match(buffer, pos)
+    elif first in (b"{", b"["):
+        depth = 0
+        # Matched one after the other rather than with finditer(), which
+        # would retry from every byte of a tail without brackets
+        token = _BRACKET.match(buffer, pos)
+        while token is not None:
+            if token.group(1) in (b"{", b"["):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return token.end()
+            token = _BRACKET.match(buffer, token.end())
+        match = None
+    else:
+        match = _SCALAR.match(buffer, pos)
+    if match is None:
+        raise ProfileFormatError(f"Malformed JSON value at byte {pos}")
+    return match.end()
+
+
+def find_json_member_range(buffer, key, pos=0):
+    """
+    Scans the JSON object starting at pos in buffer for key without parsing
+    any of the values.
+    buffer can be any bytes-like object, e.g. an mmap.
+    NOTE: unlike json.loads, the first occurrence of a duplicated key wins.
+    Returns the (start, end) byte range of the value or None.
+    """
+    pos = _skip_whitespace(buffer, pos)
+    if buffer[pos:pos + 1] != b"{":
+        raise ProfileFormatError("Not a JSON object")
+    pos = _skip_whitespace(buffer, pos + 1)
+    if buffer[pos:pos + 1] == b"}":
+        return None
+    while True:
+        key_match = _STRING.match(buffer, pos)
+        if key_match is None:
+            raise ProfileFormatError(f"Expected a key at byte {pos}")
+        pos = _skip_whitespace(buffer, key_match.end())
+        if buffer[pos:pos + 1] != b":":
+            raise ProfileFormatError(f"Expected ':' at byte {pos}")
+        value_start = _skip_whitespace(buffer, pos + 1)
+        value_end = _skip_value(buffer, value_start)
+        if json.loads(buffer[key_match.start():key_match.end()]) == key:
+            return value_start, value_end
+        pos = _skip_whitespace(buffer, value_end)
+        separator = buffer[pos:pos + 1]
+        if separator == b"}":
+            return None
+        if separator != b",":
+            raise ProfileFormatError(f"Expected ',' or '}}' at byte {pos}")
+        pos = _skip_whitespace(buffer, pos + 1)
+
+
+def find_json_member(buffer, key, pos=0):
+    """
+    Like find_json_member_range() but decodes the value, so the memory used
+    depends on the size of that one value.
+    Returns (True, value) if key was found and (False, None) otherwise.
+    """
+    value_range = find_json_member_range(buffer, key, pos)
+    if value_range is None:
+        return False, None
+    start, end = value_range
+    return True, json.loads(buffer[start:end])
+
+
+_ENVELOPE = re.compile(rb'\s*\{\s*"schema_version"\s*:\s*(\d+)\s*,')
+
+
+def find_profile(buffer, profile_name):
+    """
+    Scans a JSON profile file for one profile.
+    Returns (schema_version, found, profile).
+    """
+    envelope = _ENVELOPE.match(buffer)
+    if envelope is None:
+        return (0,) + find_json_member(buffer, profile_name)
+    profiles_range = find_json_member_range(buffer, "profiles")
+    if profiles_range is None:
+        raise ProfileFormatError("Profile file has no profiles")
+    return (int(envelope.group(1)),) + find_json_member(buffer, profile_name, profiles_range[0])
@@ -0,0 +1,318 @@
+"""
+    Session runtime for Stand Up.
+
+    A session alternates between the focus and break queues, starting with
+    focus, and cycles through each queue until the session length has been
+    used up. The interval that crosses the end of the session still runs
+    in full.
+
+    SessionQueue steps through a session one interval at a time.
+    SessionTimeline compiles the whole session up front into flat arrays so
+    any point in it can be looked up without replaying it from the start.
+"""
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+FOCUS, BREAK = 0, 1
+
+TimelineInterval = namedtuple(
+    "TimelineInterval", ("index", "start", "duration", "is_break", "reminder")
+)
+
+
+class SessionQueue:
+    """
+    Handles session runtime
+    Iterates through focus and break interval lists
+
+    Durations are kept in compact arrays next to a list of reminders,
+    which are shared objects (see reminders.shared_reminder), so a session
+    costs a few bytes per interval.
+    """
+
+    __slots__ = (
+        "total_length",
+        "session_remaining",
+        "focus_durations",
+        "focus_reminders",
+        "focus_index",
+        "break_durations",
+        "break_reminders",
+        "break_index",
+        "is_break",
+        "_timeline",
+    )
+
+    def __init__(self, total_length, focus_intervals, break_intervals):
+        self.total_length = total_length
+        self.session_remaining = total_length
+        self.focus_durations = array("I", (duration for duration, _ in focus_intervals))
+        self.focus_reminders = [reminder for _, reminder in focus_intervals]
+        self.focus_index = 0
+        self.break_durations = array("I", (duration for duration, _ in break_intervals))
+        self.break_reminders = [reminder for _, reminder in break_intervals]
+        self.break_index = 0
+        self.is_break = True
+        self._timeline = None
+
+    @property
+    def focus_intervals(self):
+        return list(zip(self.focus_durations, self.focus_reminders))
+
+    @property
+    def break_intervals(self):
+        return list(zip(self.break_durations, self.break_reminders))
+
+    def get_next_interval(self):
+        self.is_break = not self.is_break
+        if self.session_remaining <= 0:
+            return None, None, None
+        interval_length = None
+        if self.is_break and len(self.break_durations):
+            interval_length = self.break_durations[self.break_index]
+            reminder = self.break_reminders[self.break_index]
+            self.break_index += 1
+            if self.break_index == len(self.break_durations):
+                self.break_index = 0
+        elif len(self.focus_durations):
+            interval_length = self.focus_durations[self.focus_index]
+            reminder = self.focus_reminders[self.focus_index]
+            self.focus_index += 1
+            if self.focus_index == len(self.focus_durations):
+                self.focus_index = 0
+        else:
+            return None, None, None
+
+        self.session_remaining -= interval_length
+
+        return self.is_break, interval_length, reminder
+
+    def timeline(self):
+        """
+        Returns the SessionTimeline of the whole session, compiled once.
+        """
+        if self._timeline is None:
+            self._timeline = SessionTimeline(
+                self.total_length, self.focus_intervals, self.break_intervals
+            )
+        return self._timeline
+
+    def seek(self, elapsed):
+        """
+        Moves the queue so the next call to get_next_interval() returns the
+        interval running elapsed seconds into the session.
+        Returns how many seconds of that interval have already passed, or
+        None if the session is over by then.
+        """
+        timeline = self.timeline()
+        position = timeline.locate(elapsed)
+        index = len(timeline) if position is None else position[0].index
+        self.is_break = index % 2 == 0
+        self.session_remaining = self.total_length - timeline.start_of(index)
+        self.focus_index, self.break_index = timeline.queue_positions(index)
+        return None if position is None else position[1]
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}"
+            f"({self.total_length}, "
+            f"{self.focus_intervals}, "
+            f"{self.break_intervals})"
+        )
+
+
+class SessionTimeline:
+    """
+    Every interval of a session compiled into parallel arrays:
+        starts    - offset of the interval from the start of the session
+        durations - length of the interval
+        kinds     - FOCUS or BREAK, as reported by SessionQueue
+        reminders - index into self.reminder_table, focus reminders first
+    Lookups by time are a binary search over starts.
+    """
+
+    def __init__(self, total_length, focus_intervals, break_intervals):
+        if any(duration <= 0 for duration, _ in focus_intervals) or any(
+            duration <= 0 for duration, _ in break_intervals
+        ):
+            raise ValueError("Interval durations must be positive")
+        self.total_length = total_length
+        self.num_focus = len(focus_intervals)
+        self.num_break = len(break_intervals)
+        self.reminder_table = [reminder for _, reminder in focus_intervals] + [
+            reminder for _, reminder in break_intervals
+        ]
+        self.starts = array("Q")
+        self.durations = array("I")
+        self.kinds = array("B")
+        self.reminders = array("I")
+        self._compile(focus_intervals, break_intervals)
+
+    def _compile(self, focus_intervals, break_intervals):
+        # Same walk as SessionQueue.get_next_interval()
+        elapsed = 0
+        is_break = True
+        focus_index = break_index = 0
+        while elapsed < self.total_length:
+            is_break = not is_break
+            if is_break and break_intervals:
+                duration = break_intervals[break_index][0]
+                reminder = self.num_focus + break_index
+                break_index = (break_index + 1) % self.num_break
+            elif focus_intervals:
+                duration = focus_intervals[focus_index][0]
+                reminder = focus_index
+                focus_index = (focus_index + 1) % self.num_focus
+            else:
+                break
+            self.starts.append(elapsed)
+            self.durations.append(duration)
+            self.kinds.append(BREAK if is_break else FOCUS)
+            self.reminders.append(reminder)
+            elapsed += duration
+        self.end = elapsed
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("timeline index out of range")
+        return TimelineInterval(
+            index,
+            self.starts[index],
+            self.durations[index],
+            self.kinds[index] == BREAK,
+            self.reminder_table[self.reminders[index]],
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def start_of(self, index):
+        """
+        Offset at which interval index starts, or the end of the session
+        for index == len(self).
+        """
+        return self.end if index == len(self) else self.starts[index]
+
+    def locate(self, elapsed):
+        """
+        Returns (interval, seconds into it) for the interval running
+        elapsed seconds into the session, or None once the session is over.
+        """
+        if elapsed < 0:
+            raise ValueError("elapsed must not be negative")
+        if elapsed >= self.end:
+            return None
+        index = bisect_right(self.starts, elapsed) - 1
+        return self[index], elapsed - self.starts[index]
+
+    def next_interval(self, elapsed):
+        """
+        Returns the first interval that starts after elapsed seconds,
+        or None if there is none.
+        """
+        index = bisect_right(self.starts, elapsed)
+        if index == len(self):
+            return None
+        return self[index]
+
+    def queue_positions(self, index):
+        """
+        Returns (focus_index, break_index), the positions SessionQueue has
+        in its queues just before it hands out interval index.
+        Intervals alternate strictly, so this does not need the arrays.
+        """
+        if self.num_break:
+            focus_taken, break_taken = (index + 1) // 2, index // 2
+        else:
+            focus_taken, break_taken = index, 0
+        return (
+            focus_taken % self.num_focus if self.num_focus else 0,
+            break_taken % self.num_break if self.num_break else 0,
+        )
+
+
+class PatternQueue:
+    """
+    SessionQueue for a schedule written as a pattern (see standup.patterns).
+    The pattern repeats until the session length has been used up and is
+    expanded lazily, one interval per call to get_next_interval().
+    focus_reminders and break_reminders are what the @ references in the
+    pattern pick from.
+    """
+
+    __slots__ = (
+        "total_length",
+        "session_remaining",
+        "pattern",
+        "focus_reminders",
+        "break_reminders",
+        "is_break",
+        "_intervals",
+    )
+
+    def __init__(self, total_length, pattern, focus_reminders, break_reminders):
+        for interval in pattern.leaves():
+            reminders = break_reminders if interval.is_break else focus_reminders
+            if interval.reminder >= len(reminders):
+                raise ValueError(f"Pattern uses reminder {interval.reminder + 1} of {len(reminders)}")
+        self.total_length = total_length
+        self.session_remaining = total_length
+        self.pattern = pattern
+        self.focus_reminders = focus_reminders
+        self.break_reminders = break_reminders
+        self.is_break = True
+        self._intervals = pattern.intervals()
+
+    def get_next_interval(self):
+        if self.session_remaining <= 0:
+            return None, None, None
+        interval = next(self._intervals, None)
+        if interval is None:
+            self._intervals = self.pattern.intervals()
+            interval = next(self._intervals)
+        self.is_break = interval.is_break
+        reminders = self.break_reminders if interval.is_break else self.focus_reminders
+        self.session_remaining -= interval.duration
+        return interval.is_break, interval.duration, reminders[interval.reminder]
+
+    def session_end(self):
+        """
+        Seconds from the start of the session until its last interval ends.
+        """
+        if self.total_length <= 0:
+            return 0
+        cycle_time = self.pattern.duration
+        cycles = (self.total_length - 1) // cycle_time
+        interval, start = self.pattern.locate(self.total_length - 1 - cycles * cycle_time)[:2]
+        return cycles * cycle_time + start + interval.duration
+
+    def seek(self, elapsed):
+        """
+        Same as SessionQueue.seek().
+        """
+        if elapsed < 0:
+            raise ValueError("elapsed must not be negative")
+        if elapsed >= self.session_end():
+            self.session_remaining = 0
+            return None
+        cycles, offset = divmod(elapsed, self.pattern.duration)
+        start = self.pattern.locate(offset)[1]
+        self._intervals = self.pattern.intervals(offset)
+        self.session_remaining = self.total_length - cycles * self.pattern.duration - start
+        return offset - start
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}"
+            f"({self.total_length}, "
+            f"{self.pattern!r}, "
+            f"{self.focus_reminders}, "
+            f"{self.break_reminders})"
+        )
@@ -0,0 +1,241 @@
+"""
+    Runs sessions on a VirtualClock instead of waiting for them.
+
+    SessionRunner steps a session queue the way StandUpWindow does: every
+    interval is a Countdown on the clock, and when its deadline is reached
+    the interval's reminder fires and the next interval starts. On a
+    VirtualClock the clock jumps from one deadline to the next, so an
+    8 hour session runs in well under a millisecond and weeks of
+    back-to-back sessions in seconds.
+
+    simulate() checks every reminder of every session against what the
+    session should do, worked out independently of the queues (see
+    check_session()), and soak() runs sessions back to back while
+    watching the memory in use, to catch state that builds up over long
+    runs.
+
+    Reminders in a simulation are (is_break, index) pairs naming the
+    focus or break interval of the profile that provides them, rather
+    than Reminder objects, which would open browsers and popups.
+"""
+import gc
+import tracemalloc
+from collections import namedtuple
+
+from standup.analysis import analyze_profile, profile_durations
+from standup.clock import NS_PER_SECOND, Countdown, VirtualClock
+from standup.patterns import parse_pattern
+from standup.session import PatternQueue, SessionQueue, SessionTimeline
+
+ReminderEvent = namedtuple(
+    "ReminderEvent", ("session", "start", "end", "is_break", "reminder")
+)  # start and end are seconds from the start of the session
+
+SoakReport = namedtuple(
+    "SoakReport",
+    (
+        "sessions",
+        "reminders",
+        "simulated_time",   # seconds
+        "errors",           # problems found by check_session()
+        "memory_start",     # bytes in use after the first session
+        "memory_end",       # bytes in use after the last session
+        "memory_peak",
+    ),
+)
+
+
+def profile_reminders(profile):
+    """
+    Returns the (is_break, index) reminders of a profile's focus and break
+    intervals.
+    """
+    return (
+        [(False, index) for index in range(len(profile["focus_intervals"]))],
+        [(True, index) for index in range(len(profile["break_intervals"]))],
+    )
+
+
+def profile_queue(profile):
+    """
+    Returns the queue StandUpWindow would run for a stored profile, with
+    profile_reminders() as its reminders.
+    Raises ValueError if the profile's pattern is invalid.
+    """
+    focus_reminders, break_reminders = profile_reminders(profile)
+    total_length, focus_durations, break_durations = profile_durations(profile)
+    if profile.get("pattern"):
+        return PatternQueue(
+            total_length, parse_pattern(profile["pattern"]), focus_reminders, break_reminders
+        )
+    return SessionQueue(
+        total_length,
+        list(zip(focus_durations, focus_reminders)),
+        list(zip(break_durations, break_reminders)),
+    )
+
+
+class SessionRunner:
+    """
+    Runs one session on a clock, calling on_reminder(event) with a
+    ReminderEvent every time an interval ends and on_finish() once the
+    session is over.
+    """
+
+    def __init__(self, queue, clock, on_reminder, on_finish=None, session=1):
+        self.queue = queue
+        self.clock = clock
+        self.on_reminder = on_reminder
+        self.on_finish = on_finish
+        self.session = session
+        self.countdown = Countdown(clock)
+        self.started = None
+        self.interval = None
+        self.finished = False
+
+    def start(self):
+        self.started = self.clock.now_ns()
+        self.run_next_interval()
+
+    def run_next_interval(self):
+        is_break, duration, reminder = self.queue.get_next_interval()
+        if duration is None:
+            self.finished = True
+            if self.on_finish is not None:
+                self.on_finish()
+            return
+        self.interval = (self.clock.now_ns(), is_break, reminder)
+        self.countdown.reset(duration)
+        self.countdown.resume()
+        self.clock.call_at(self.countdown.deadline, self.interval_ended)
+
+    def interval_ended(self):
+        started, is_break, reminder = self.interval
+        self.on_reminder(
+            ReminderEvent(
+                self.session,
+                (started - self.started) // NS_PER_SECOND,
+                (self.clock.now_ns() - self.started) // NS_PER_SECOND,
+                is_break,
+                reminder,
+            )
+        )
+        self.run_next_interval()
+
+
+def _expected_intervals(profile):
+    """
+    Yields (start, duration, is_break, reminder) for every interval the
+    session of profile should run, from the compiled SessionTimeline or
+    by locating each interval in the pattern.
+    """
+    focus_reminders, break_reminders = profile_reminders(profile)
+    total_length, focus_durations, break_durations = profile_durations(profile)
+    if not profile.get("pattern"):
+        timeline = SessionTimeline(
+            total_length,
+            list(zip(focus_durations, focus_reminders)),
+            list(zip(break_durations, break_reminders)),
+        )
+        for interval in timeline:
+            yield interval.start, interval.duration, interval.is_break, interval.reminder
+        return
+    pattern = parse_pattern(profile["pattern"])
+    start = 0
+    while start < total_length:
+        interval = pattern.locate(start % pattern.duration)[0]
+        yield start, interval.duration, interval.is_break, (interval.is_break, interval.reminder)
+        start += interval.duration
+
+
+def check_session(profile, events):
+    """
+    Compares the ReminderEvents of one session of profile with what the
+    session should do. Returns a list of problems, empty if they match.
+    """
+    errors = []
+    expected = _expected_intervals(profile)
+    count = 0
+    end = 0
+    for event in events:
+        want = next(expected, None)
+        if want is None:
+            errors.append(f"reminder {count + 1} fired after the session should have ended")
+            break
+        start, duration, is_break, reminder = want
+        got = (event.start, event.end - event.start, event.is_break, event.reminder)
+        if got != (start, duration, is_break, reminder):
+            errors.append(
+                f"reminder {count + 1} was {got}, expected {(start, duration, is_break, reminder)}"
+            )
+        count += 1
+        end = event.end
+    if next(expected, None) is not None:
+        errors.append(f"the session ended after {count} reminders, too early")
+    summary = analyze_profile(profile)
+    if not errors and (count, end) != (summary.intervals, summary.end):
+        errors.append(
+            f"{count} reminders ending at {end}, "
+            f"analysis expects {summary.intervals} ending at {summary.end}"
+        )
+    return errors
+
+
+def run_sessions(profile, sessions=1, clock=None):
+    """
+    Runs sessions of profile back to back on clock, a new VirtualClock by
+    default, and yields the ReminderEvents of one session at a time as a
+    list.
+    """
+    if clock is None:
+        clock = VirtualClock()
+    for session in range(1, sessions + 1):
+        events = []
+        runner = SessionRunner(profile_queue(profile), clock, events.append, session=session)
+        runner.start()
+        clock.run()
+        if not runner.finished:
+            raise RuntimeError("the clock stopped before the session finished")
+        yield events
+
+
+def simulate(profile, sessions=1):
+    """
+    Runs sessions of profile and yields (events, errors) for each, where
+    errors are the problems check_session() found.
+    """
+    for events in run_sessions(profile, sessions):
+        yield events, check_session(profile, events)
+
+
+def soak(profile, sessions, check=True):
+    """
+    Runs sessions of profile back to back with the memory in use traced.
+    Memory that keeps growing from the first session to the last means
+    something is kept between sessions that should not be.
+    Returns a SoakReport.
+    """
+    reminders = simulated_time = 0
+    errors = []
+    memory_start = memory_end = 0
+    tracemalloc.start()
+    try:
+        for session, events in enumerate(run_sessions(profile, sessions), 1):
+            reminders += len(events)
+            if events:
+                simulated_time += events[-1].end
+            if check and not errors:
+                errors = [f"session {session}: {error}" for error in check_session(profile, events)]
+            del events
+            # Measured at the same point of the first and the last session
+            if session in (1, sessions):
+                gc.collect()
+                memory_end = tracemalloc.get_traced_memory()[0]
+                if session == 1:
+                    memory_start = memory_end
+        memory_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return SoakReport(
+        sessions, reminders, simulated_time, errors, memory_start, memory_end, memory_peak
+    )
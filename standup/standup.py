@@ -1,12 +1,12 @@
 """
     GUI application to plan work sessions with focus and break intervals.
 """
-import json
+import collections
 import os
-
 import webbrowser
 
 import sys
+from concurrent.futures import Future
 from PySide6 import QtWidgets as qw
 from PySide6 import QtCore, QtGui
 
@@ -14,81 +14,12 @@ from standup import rcicons
 
 from standup.QProgressRing import QProgressRing
 from standup import reminders
-
-
-def get_profile_location():
-    home = os.getenv("HOME")
-    if home is None:
-        home = os.getenv("UserProfile")
-    filename = "profiles.json"
-    if sys.platform == "win32":
-        profile_path = os.path.join(home, "AppData", "Local", "standup", filename)
-    elif sys.platform.startswith("linux"):
-        profile_path = os.path.join(home, ".local", "share", "standup", filename)
-    elif sys.platform == "darwin": # Mac
-        profile_path = os.path.join(home, "Library", "Application Support", "standup", filename)
-    else:
-        profile_path = os.path.join(os.path.dirname(__file__), filename)
-    if profile_path:
-        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
-    return profile_path
-
-
-def validate_reminder_types(profiles):
-    """
-    Checks profile data for invalid reminder types and fixes errors
-    ex: profile uses a reminder type that has been removed)
-    If an invalid reminder type is found it is replaced with 'None'
-    """
-
-    for profile in profiles:
-        for interval in profiles[profile]["focus_intervals"]:
-            if interval["reminder"]["name"] not in reminders.reminder_option_dict:
-                interval["reminder"]["name"] = "None"
-        for interval in profiles[profile]["break_intervals"]:
-            if interval["reminder"]["name"] not in reminders.reminder_option_dict:
-                interval["reminder"]["name"] = "None"
-    return profiles
-
-
-def read_profiles(filename=None):
-    if filename is None:
-        filename = get_profile_location()
-    with open(filename, "a+") as config:
-        config.seek(0)
-        try:
-            profiles = json.load(config)
-        except json.JSONDecodeError:
-            profiles = {}
-        profiles = validate_reminder_types(profiles)
-        write_profiles(profiles, None)
-        return profiles
-
-
-def load_profile(profile_name: str):
-    profile = read_profiles().get(profile_name)
-    return profile
-
-
-def write_profiles(data, filename=None):
-    if filename is None:
-        filename = get_profile_location()
-    with open(filename, "w+") as config:
-        json.dump(data, config, indent="  ")
-
-
-def save_profile(profile_name: str, data: dict):
-    profiles = read_profiles()
-    profiles[profile_name] = data
-    write_profiles(profiles)
-
-
-def delete_profile(profile_name):
-    profiles = read_profiles()
-    del profiles[
-        profile_name
-    ]  # TODO add try-catch? Technically this shouldn't fail but you never know
-    write_profiles(profiles)
+from standup.checkpoint import SessionCheckpoint
+from standup.clock import NS_PER_MS, NS_PER_SECOND, Clock, Countdown
+from standup.profiles import get_profile_store
+from standup.patterns import PatternError, format_pattern, parse_pattern
+from standup.session import PatternQueue, SessionQueue
+from standup.tray import SessionTrayIcon
 
 
 def get_children(layout):
@@ -115,51 +46,6 @@ class DurationSpinBox(qw.QSpinBox):
 
 
 
-class SessionQueue:
-    """
-    Handles session runtime
-    Iterates through focus and break interval lists
-    """
-
-    def __init__(self, total_length, focus_intervals, break_intervals):
-        self.session_remaining = total_length
-        self.focus_intervals = focus_intervals
-        self.focus_index = 0
-        self.break_intervals = break_intervals
-        self.break_index = 0
-        self.is_break = True
-
-    def get_next_interval(self):
-        self.is_break = not self.is_break
-        if self.session_remaining <= 0:
-            return None, None, None
-        interval_length = None
-        if self.is_break and len(self.break_intervals):
-            interval_length, reminder = self.break_intervals[self.break_index]
-            self.break_index += 1
-            if self.break_index == len(self.break_intervals):
-                self.break_index = 0
-        elif len(self.focus_intervals):
-            interval_length, reminder = self.focus_intervals[self.focus_index]
-            self.focus_index += 1
-            if self.focus_index == len(self.focus_intervals):
-                self.focus_index = 0
-        else:
-            return None, None, None
-
-        self.session_remaining -= interval_length
-
-        return self.is_break, interval_length, reminder
-
-    def __repr__(self):
-        return (
-            f"{self.__class__.__name__}"
-            f"({self.session_remaining}, "
-            f"{self.focus_interval}, "
-            f"{self.break_interval})"
-        )
-
-
 class IntervalOptions(qw.QWidget):
 
     def __init__(self):
@@ -237,6 +123,11 @@ class IntervalOptions(qw.QWidget):
 
 
 class SessionOptions(qw.QWidget):
+    _PATTERN_HELP = (
+        "Repeats blocks of focus (f) and break (b) intervals, in minutes.\n"
+        "25f@2 takes its reminder from the second focus interval below."
+    )
+
     def __init__(self):
         super().__init__()
         self.init_ui()
@@ -261,6 +152,14 @@ class SessionOptions(qw.QWidget):
         self.session_dur_label = qw.QLabel("Session Length:")
         self.session_duration = DurationSpinBox()
 
+        self.pattern_label = qw.QLabel("Pattern:")
+        self.pattern_input = qw.QLineEdit()
+        self.pattern_input.setPlaceholderText(
+            "e.g. 4x(25f,5b),15b - leave empty to alternate the intervals below"
+        )
+        self.pattern_input.setToolTip(self._PATTERN_HELP)
+        self.pattern_input.textChanged.connect(self.checkPattern)
+
         self.interval_options_container = qw.QWidget()
         self.interval_options_grid = qw.QGridLayout(self.interval_options_container)
 
@@ -312,9 +211,11 @@ class SessionOptions(qw.QWidget):
 
         self.layout.addWidget(self.session_dur_label, 0, 0, QtCore.Qt.AlignRight)
         self.layout.addWidget(self.session_duration, 0, 1, QtCore.Qt.AlignLeft)
-        self.layout.addWidget(self.interval_options_container, 1, 0, 1, 2)
+        self.layout.addWidget(self.pattern_label, 1, 0, QtCore.Qt.AlignRight)
+        self.layout.addWidget(self.pattern_input, 1, 1)
+        self.layout.addWidget(self.interval_options_container, 2, 0, 1, 2)
 
-        self.layout.setRowStretch(1, 1)
+        self.layout.setRowStretch(2, 1)
 
         self.addFocusInterval()
         self.addBreakInterval()
@@ -366,7 +267,21 @@ class SessionOptions(qw.QWidget):
             w.blockSignals(True)
             w.deleteLater()
 
+    def checkPattern(self, text):
+        try:
+            if text.strip():
+                parse_pattern(text)
+        except PatternError as error:
+            self.pattern_input.setStyleSheet("QLineEdit{border: 1px solid red}")
+            self.pattern_input.setToolTip(str(error))
+        else:
+            self.pattern_input.setStyleSheet("")
+            self.pattern_input.setToolTip(self._PATTERN_HELP)
+
     def get_session_queue(self):
+        """
+        Raises PatternError or ValueError if the pattern is invalid.
+        """
         session_duration = self.session_duration.value() * 60
 
         focus_intervals = [
@@ -379,6 +294,16 @@ class SessionOptions(qw.QWidget):
             for break_widget in get_children(self.break_intervals_container)
         ]
 
+        pattern = self.pattern_input.text().strip()
+        if pattern:
+            # The intervals only provide the reminders the pattern refers to
+            return PatternQueue(
+                session_duration,
+                parse_pattern(pattern),
+                [reminder for _, reminder in focus_intervals],
+                [reminder for _, reminder in break_intervals],
+            )
+
         session_queue = SessionQueue(session_duration, focus_intervals, break_intervals)
 
         return session_queue
@@ -394,11 +319,19 @@ class SessionOptions(qw.QWidget):
             break_widget.getData()
             for break_widget in get_children(self.break_intervals_container)
         ]
+        pattern = self.pattern_input.text().strip()
+        try:
+            if pattern:
+                data["pattern"] = format_pattern(parse_pattern(pattern))
+        except PatternError:
+            # Keep what the user typed so they can fix it later
+            data["pattern"] = pattern
 
         return data
 
     def putData(self, data):
         self.session_duration.setValue(data["session_duration"])
+        self.pattern_input.setText(data.get("pattern", ""))
 
         # Reuse as many IntervalOptions widgets as possible
         diff = len(data["focus_intervals"]) - self.focus_intervals_container.count()
@@ -426,22 +359,98 @@ class SessionOptions(qw.QWidget):
             )
 
 
+# QTimer counts a clock that stops while the computer is suspended, so
+# long waits are split into parts of at most this many milliseconds and
+# the deadline is checked on the clock after each one. A deadline that
+# passes during a suspend is then met at most this late after waking up.
+QT_CALL_MAX_WAIT_MS = 60 * 1000
+
+
+class _QtCall(QtCore.QTimer):
+    def __init__(self, clock, deadline_ns, callback, parent):
+        super().__init__(parent)
+        self.clock = clock
+        self.deadline_ns = deadline_ns
+        self.callback = callback
+        self.setSingleShot(True)
+        self.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timeout.connect(self.fire)
+        self.arm()
+
+    def arm(self):
+        # Round up so the timer never fires before the deadline
+        remaining_ms = -(-(self.deadline_ns - self.clock.now_ns()) // NS_PER_MS)
+        self.start(min(max(0, remaining_ms), QT_CALL_MAX_WAIT_MS))
+
+    def fire(self):
+        if self.clock.now_ns() < self.deadline_ns:
+            # Fired early, or after one part of a long wait
+            self.arm()
+            return
+        self.deleteLater()
+        self.callback()
+
+    def cancel(self):
+        self.stop()
+        self.deleteLater()
+
+
+class QtClock(Clock):
+    """
+    The monotonic clock, with calls made from the Qt event loop by
+    precise single-shot timers that are children of parent.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+
+    def call_at(self, deadline_ns, callback):
+        return _QtCall(self, deadline_ns, callback, self.parent)
+
+
 class TimerWidget(qw.QWidget):
     """
     Class that handles all timer events
     Uses a QProgressRing
+
+    The countdown runs to a deadline on a monotonic clock (see
+    standup.clock.Countdown) and the time left is worked out from the
+    deadline on every update, so late or missed timer ticks (a busy event
+    loop, a modal popup or a suspend) never make an interval run long.
+    The clock calls back at the deadline itself. It is a QtClock unless
+    another one, e.g. a VirtualClock, is passed in.
+
+    The display is only woken up when what it shows changes: the display
+    timer is armed for the moment the next second (or minute, in power
+    saving mode) is due, and not at all while the ring cannot be seen,
+    e.g. when the window is minimized or covered. self.wakeups counts
+    the timer wakeups so the savings can be checked, timerStats() returns
+    them together with the ring's frame_stats.
+
+    In smooth mode the arc moves continuously instead of once a second.
+    Frames are drawn at most at the refresh rate of the screen and no
+    more often than it takes the arc to move a pixel, and are spaced out
+    further if painting takes more than a quarter of the time between
+    them. The ring's frame_stats show what that costs.
     """
 
     done = QtCore.Signal(
         bool
     )  # Bool tells if timer was cancelled (False) or run to completion (True)
+    stateChanged = QtCore.Signal()  # Paused or resumed
 
-    def __init__(self):
+    def __init__(self, clock=None):
         super().__init__()
-        self.timer_id = None
-        self.paused = True
+        self.clock = clock if clock is not None else QtClock(self)
+        self.countdown = Countdown(self.clock)
+        self.deadline_call = None
+        self.smooth = False
+        self.wakeups = collections.Counter()
+        self._watched_window = None
 
-        self._timer_interval = 1000
+        self.display_timer = QtCore.QTimer(self)
+        self.display_timer.setSingleShot(True)
+        self.display_timer.timeout.connect(self.displayTimeout)
 
         self.initUI()
 
@@ -466,48 +475,422 @@ class TimerWidget(qw.QWidget):
         self.finish_button = qw.QPushButton("Finish")
         self.finish_button.clicked.connect(self.timerFinished)
 
+        self.power_saving_toggle = qw.QCheckBox("Power saving")
+        self.power_saving_toggle.setToolTip("Only show minutes and update the timer less often")
+        self.power_saving_toggle.toggled.connect(self.setPowerSaving)
+
+        self.smooth_toggle = qw.QCheckBox("Smooth")
+        self.smooth_toggle.setToolTip("Move the ring continuously instead of once a second")
+        self.smooth_toggle.toggled.connect(self.setSmooth)
+
         self.control_container.addWidget(self.stop_button)
         self.control_container.addWidget(self.pause_toggle)
         self.control_container.addWidget(self.finish_button)
+        self.control_container.addWidget(self.power_saving_toggle)
+        self.control_container.addWidget(self.smooth_toggle)
 
         self.layout.addWidget(self.progress_ring)
         self.layout.addLayout(self.control_container)
 
     def startTimer(self):
-        if self.timer_id is None:
-            self.timer_id = super().startTimer(self._timer_interval)
-            self.paused = False
+        if self.countdown.paused:
+            self.countdown.resume()
             self.pause_toggle.setText("Pause")
+            self.deadline_call = self.clock.call_at(self.countdown.deadline, self.deadlineTimeout)
+            self.scheduleDisplay()
+            self.stateChanged.emit()
 
-    def killTimer(self, timer_id):
-        if timer_id is not None:
-            super().killTimer(timer_id)
-            self.timer_id = None
-            self.paused = True
+    def pauseTimer(self):
+        if not self.countdown.paused:
+            self.countdown.pause()
             self.pause_toggle.setText("Unpause")
+            self.display_timer.stop()
+            if self.deadline_call is not None:
+                self.deadline_call.cancel()
+                self.deadline_call = None
+            self.stateChanged.emit()
+
+    def setPowerSaving(self, power_saving):
+        if power_saving:
+            self.smooth_toggle.setChecked(False)
+        self.progress_ring.setFormat("minutes" if power_saving else "countdown")
+        self.scheduleDisplay()
+
+    def setSmooth(self, smooth):
+        if smooth:
+            self.power_saving_toggle.setChecked(False)
+        self.smooth = smooth
+        if not smooth:
+            # Back to whole seconds
+            self.progress_ring.setArcValue(self.progress_ring.value())
+        self.updateCountdown()
+
+    def frameInterval(self):
+        """
+        Nanoseconds between frames in smooth mode.
+        """
+        refresh_rate = self.screen().refreshRate() or 60
+        interval = NS_PER_SECOND / refresh_rate
+        ring_pixels = self.progress_ring.circumference() * self.devicePixelRatioF()
+        if ring_pixels and self.countdown.duration:
+            # Frames in which the arc moves less than a pixel look the same
+            interval = max(interval, self.countdown.duration * NS_PER_SECOND / ring_pixels)
+        # Keep painting to a quarter of the time
+        interval = max(interval, 4 * self.progress_ring.frame_stats.recent_ns)
+        return int(interval)
+
+    def displayVisible(self):
+        """
+        False when nobody can see the ring, so updating it is wasted.
+        """
+        if not self.progress_ring.isVisible():
+            return False
+        window = self.window().windowHandle()
+        if window is None:
+            return False
+        return window.isExposed() and window.visibility() not in (
+            QtGui.QWindow.Hidden,
+            QtGui.QWindow.Minimized,
+        )
+
+    def scheduleDisplay(self):
+        """
+        Arms the display timer for the next change of the displayed time.
+        """
+        self.display_timer.stop()
+        if self.countdown.paused or not self.displayVisible():
+            return
+        step = self.progress_ring.displayStep() * NS_PER_SECOND
+        # The display shows the time left rounded up to whole steps, so it
+        # changes when the time left drops to the next multiple of step
+        until_change = self.timeLeft() % step or step
+        if self.smooth:
+            until_change = min(until_change, self.frameInterval())
+        timeout_ms = -(-until_change // NS_PER_MS)
+        if self.smooth:
+            self.display_timer.setTimerType(QtCore.Qt.PreciseTimer)
+        elif step >= 60 * NS_PER_SECOND:
+            # Only accurate to the second, wait a little longer so it never
+            # fires before the change
+            self.display_timer.setTimerType(QtCore.Qt.VeryCoarseTimer)
+            timeout_ms += 1000
+        else:
+            self.display_timer.setTimerType(QtCore.Qt.CoarseTimer)
+        self.display_timer.start(timeout_ms)
+
+    def displayTimeout(self):
+        self.wakeups["display"] += 1
+        self.updateCountdown()
+
+    def timerStats(self):
+        """
+        Returns the timer wakeups and the ring's FrameStats so far,
+        for benchmarks and simulations.
+        """
+        return {"wakeups": dict(self.wakeups), "frames": self.progress_ring.frame_stats}
+
+    def deadlineTimeout(self):
+        self.deadline_call = None
+        self.wakeups["deadline"] += 1
+        self.updateCountdown()
+
+    def showEvent(self, show_event):
+        super().showEvent(show_event)
+        window = self.window().windowHandle()
+        if window is not None and window is not self._watched_window:
+            # Minimizing, restoring and covering the window do not reach
+            # this widget, but the native window is told with an Expose event
+            window.installEventFilter(self)
+            self._watched_window = window
+        self.visibilityChanged()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Expose:
+            # Queued, the window only reports itself exposed after the event
+            QtCore.QTimer.singleShot(0, self.visibilityChanged)
+        return super().eventFilter(watched, event)
+
+    def visibilityChanged(self):
+        if self.displayVisible():
+            # Catch up on whatever changed while nobody was looking
+            self.updateCountdown()
+        else:
+            self.display_timer.stop()
 
     def togglePause(self):
-        if self.paused:
+        if self.countdown.paused:
             self.startTimer()
         else:
-            self.killTimer(self.timer_id)
+            self.pauseTimer()
 
     def stopTimer(self, _):
-        self.killTimer(self.timer_id)
+        self.pauseTimer()
         self.done.emit(False)
 
     def timerFinished(self):
-        self.killTimer(self.timer_id)
+        self.pauseTimer()
         self.done.emit(True)
 
-    def startNewCountdown(self, duration):
+    def startNewCountdown(self, duration, elapsed=0):
+        self.pauseTimer()
+        self.countdown.reset(duration, elapsed)
         self.progress_ring.setMaximum(duration)
-        self.progress_ring.setValue(0)
+        self.progress_ring.setValue(elapsed)
         self.startTimer()
 
-    def timerEvent(self, timer_event):
-        if self.timer_id == timer_event.timerId():
-            self.progress_ring.setValue(self.progress_ring.value() + 1)
+    def timeLeft(self):
+        """
+        Nanoseconds left in the current countdown.
+        """
+        return self.countdown.time_left()
+
+    def elapsed(self):
+        """
+        Whole seconds of the current countdown that have run.
+        """
+        return self.countdown.elapsed()
+
+    def updateCountdown(self):
+        if self.countdown.paused:
+            return
+        elapsed = self.elapsed()
+        if elapsed != self.progress_ring.value():
+            # Reaching the maximum emits complete, which finishes the timer
+            self.progress_ring.setValue(elapsed)
+        if self.smooth and not self.countdown.paused:
+            self.progress_ring.setArcValue(
+                self.countdown.duration - self.timeLeft() / NS_PER_SECOND
+            )
+        self.scheduleDisplay()
+
+
+class _ProfileBatchWrite(QtCore.QRunnable):
+    def __init__(self, writer, batch, futures):
+        super().__init__()
+        self.writer = writer
+        self.batch = batch
+        self.futures = futures
+
+    def run(self):
+        self.writer.writeBatch(self.batch, self.futures)
+
+
+class _ProfileNamesRead(QtCore.QRunnable):
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+
+    def run(self):
+        self.writer.readNames()
+
+
+class ProfileWriter(QtCore.QObject):
+    """
+    Saves profiles on a worker thread so slow disks don't freeze the GUI.
+
+    Changes that arrive within COMMIT_WINDOW_MS of the first one are written
+    together with one store.apply_changes() call, e.g. a single fsync'd
+    journal append. Batches are written one at a time and in order.
+    Until a change is on disk, load(), names() and name_taken() answer
+    from the queued changes so the GUI always reads its own writes.
+    save() and delete() return a concurrent.futures.Future that completes
+    once the change is written.
+
+    names() and name_taken() never touch the store, which can be busy
+    writing: they use the names it held when it was last read on the
+    worker thread, after every batch or when refreshNames() is called.
+    namesRead is emitted every time those are updated.
+    """
+
+    saved = QtCore.Signal(list)
+    failed = QtCore.Signal(list, str)
+    namesRead = QtCore.Signal()
+    _batchDone = QtCore.Signal(object, object, object)
+    _namesDone = QtCore.Signal(object)
+
+    COMMIT_WINDOW_MS = 200
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        # Profile name -> new data, or None if the profile is deleted
+        self.pending = {}
+        self.pending_futures = []
+        # Batches handed to the worker thread, oldest first
+        self.in_flight = []
+        # Names in the store as of the last batch written or names read
+        self.stored_names = store.names()
+
+        self.thread_pool = QtCore.QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.commit_timer = QtCore.QTimer(self)
+        self.commit_timer.setSingleShot(True)
+        self.commit_timer.setInterval(self.COMMIT_WINDOW_MS)
+        self.commit_timer.timeout.connect(self.flush)
+
+        self._batchDone.connect(self.finishBatch)
+        self._namesDone.connect(self.setStoredNames)
+
+    def save(self, profile_name, data):
+        return self.queueChange(profile_name, data)
+
+    def delete(self, profile_name):
+        return self.queueChange(profile_name, None)
+
+    def queueChange(self, profile_name, data):
+        self.pending[profile_name] = data
+        future = Future()
+        self.pending_futures.append(future)
+        if not self.commit_timer.isActive():
+            self.commit_timer.start()
+        return future
+
+    def flush(self):
+        """
+        Hands the queued changes to the worker thread right away.
+        """
+        self.commit_timer.stop()
+        if not self.pending:
+            return
+        batch, futures = self.pending, self.pending_futures
+        self.pending, self.pending_futures = {}, []
+        self.in_flight.append(batch)
+        self.thread_pool.start(_ProfileBatchWrite(self, batch, futures))
+
+    def waitForWrites(self):
+        self.flush()
+        self.thread_pool.waitForDone()
+
+    def writeBatch(self, batch, futures):
+        # Runs on the worker thread
+        try:
+            self.store.apply_changes(batch)
+        except Exception as error:
+            for future in futures:
+                future.set_exception(error)
+            self._batchDone.emit(batch, error, None)
+        else:
+            for future in futures:
+                future.set_result(None)
+            try:
+                names = self.store.names()
+            except Exception:
+                names = None
+            self._batchDone.emit(batch, None, names)
+
+    def finishBatch(self, batch, error, names):
+        # The batch stops counting as queued in the same step as its names
+        # are stored, so names() never misses it
+        self.in_flight = [written for written in self.in_flight if written is not batch]
+        if names is not None:
+            self.setStoredNames(names)
+        if error is None:
+            self.saved.emit(list(batch))
+        else:
+            self.failed.emit(list(batch), str(error))
+
+    def refreshNames(self):
+        """
+        Reads the names in the store again on the worker thread, after the
+        batches before it are written.
+        """
+        self.thread_pool.start(_ProfileNamesRead(self))
+
+    def readNames(self):
+        # Runs on the worker thread
+        try:
+            names = self.store.names()
+        except Exception:
+            return
+        self._namesDone.emit(names)
+
+    def setStoredNames(self, names):
+        self.stored_names = names
+        self.namesRead.emit()
+
+    def queuedChanges(self):
+        changes = {}
+        for batch in self.in_flight:
+            changes.update(batch)
+        changes.update(self.pending)
+        return changes
+
+    def load(self, profile_name):
+        changes = self.queuedChanges()
+        if profile_name in changes:
+            return changes[profile_name]
+        return self.store.load(profile_name)
+
+    def names(self):
+        changes = self.queuedChanges()
+        names = [name for name in self.stored_names if changes.get(name, True) is not None]
+        stored = set(names)
+        names += [
+            name for name, data in changes.items()
+            if data is not None and name not in stored
+        ]
+        return names
+
+    def name_taken(self, profile_name):
+        lowered = profile_name.lower()
+        for name, data in self.queuedChanges().items():
+            if name.lower() == lowered:
+                return data is not None
+        return any(name.lower() == lowered for name in self.stored_names)
+
+    def watch_paths(self):
+        return self.store.watch_paths()
+
+
+class ProfileWatcher(QtCore.QObject):
+    """
+    Watches the files of a profile store for changes made by other
+    Stand Up instances or scripts and emits the new list of profile names.
+    Bursts of file events are coalesced into one check of the store, which
+    the ProfileWriter wrapping the store reads on its worker thread.
+    """
+
+    profilesChanged = QtCore.Signal(list)
+
+    _SETTLE_MS = 250
+
+    def __init__(self, writer, parent=None):
+        super().__init__(parent)
+        self.store = writer
+        self.known_names = writer.names()
+        writer.namesRead.connect(self.namesRead)
+
+        self.settle_timer = QtCore.QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(self._SETTLE_MS)
+        self.settle_timer.timeout.connect(self.checkStore)
+
+        self.file_watcher = QtCore.QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.settle_timer.start)
+        self.file_watcher.directoryChanged.connect(self.settle_timer.start)
+        self.watchPaths()
+
+    def watchPaths(self):
+        # Files replaced by a rename stop being watched, so this is
+        # called again after every change
+        watched = set(self.file_watcher.files() + self.file_watcher.directories())
+        missing = [
+            path for path in self.store.watch_paths()
+            if path not in watched and QtCore.QFileInfo.exists(path)
+        ]
+        if missing:
+            self.file_watcher.addPaths(missing)
+
+    def checkStore(self):
+        self.watchPaths()
+        self.store.refreshNames()
+
+    def namesRead(self):
+        names = self.store.names()
+        if names != self.known_names:
+            self.known_names = names
+            self.profilesChanged.emit(names)
 
 
 class ProfileSelect(qw.QWidget):
@@ -519,9 +902,9 @@ class ProfileSelect(qw.QWidget):
     updateProfile = QtCore.Signal(str)
     deleteProfile = QtCore.Signal(str)
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, store=None):
         super().__init__()
-        # self._filename = filename
+        self.store = store if store is not None else ProfileWriter(get_profile_store(), self)
         self.initUI()
 
     def initUI(self):
@@ -532,8 +915,10 @@ class ProfileSelect(qw.QWidget):
 
         self.PLACEHOLDER_TEXT = "-- Choose Profile --"
         self.profile_dropdown.addItem(self.PLACEHOLDER_TEXT)
-        for profile_name in read_profiles().keys():
-            self.profile_dropdown.addItem(profile_name)
+
+        self.profile_watcher = ProfileWatcher(self.store, self)
+        self.profile_watcher.profilesChanged.connect(self.syncProfiles)
+        self.profile_dropdown.addItems(self.profile_watcher.known_names)
 
         update_profile = qw.QPushButton("Save")
         update_profile.clicked.connect(
@@ -554,6 +939,26 @@ class ProfileSelect(qw.QWidget):
         self.profile_dropdown.setCurrentIndex(0)
 
 
+    def syncProfiles(self, names):
+        """
+        Adds and removes dropdown entries so they match names,
+        leaving entries that did not change alone.
+        """
+        # Signals are blocked so the dropdown can't jump to (and load)
+        # another profile when the selected one goes away
+        selected = self.profile_dropdown.currentText()
+        self.profile_dropdown.blockSignals(True)
+        current = set(names)
+        for index in range(self.profile_dropdown.count() - 1, -1, -1):
+            name = self.profile_dropdown.itemText(index)
+            if name != self.PLACEHOLDER_TEXT and name not in current:
+                self.profile_dropdown.removeItem(index)
+        for name in names:
+            if self.profile_dropdown.findText(name) == -1:
+                self.profile_dropdown.addItem(name)
+        self.profile_dropdown.setCurrentIndex(self.profile_dropdown.findText(selected))
+        self.profile_dropdown.blockSignals(False)
+
     def profileSelected(self, name):
         if name == self.PLACEHOLDER_TEXT:
             return
@@ -563,8 +968,6 @@ class ProfileSelect(qw.QWidget):
             self.profileChanged.emit(name)
 
     def getUniqueProfileName(self):
-        taken_names = [profile_name.lower() for profile_name in read_profiles().keys()]
-        taken_names.append(self.PLACEHOLDER_TEXT)
         valid_name = False
         name = None
         first_loop = True
@@ -579,7 +982,11 @@ class ProfileSelect(qw.QWidget):
             )
             if not ok_clicked:
                 break
-            valid_name = (name and name.strip()) and (name.lower() not in taken_names)
+            valid_name = (
+                (name and name.strip())
+                and name.lower() != self.PLACEHOLDER_TEXT.lower()
+                and not self.store.name_taken(name)
+            )
             first_loop = False
         return name if valid_name else None
 
@@ -607,13 +1014,38 @@ class ProfileSelect(qw.QWidget):
 
 
 class StandUpWindow(qw.QMainWindow):
+    # How often the position in a running interval is checkpointed,
+    # interval boundaries are always checkpointed right away
+    CHECKPOINT_INTERVAL_MS = 10000
+
     def __init__(self):
         super().__init__()
+        self.tray = None
         self.window_title = "Stand Up"
         self.setWindowTitle(self.window_title)
 
+        self.session_queue = None
+        self.interval_start = 0
+        self.interval_duration = None
+        self.checkpoint = SessionCheckpoint()
+        self.checkpoint_timer = QtCore.QTimer(self)
+        self.checkpoint_timer.setInterval(self.CHECKPOINT_INTERVAL_MS)
+        self.checkpoint_timer.timeout.connect(self.saveCheckpoint)
+
         self.init_ui()
 
+        # Set STANDUP_TRAY=1 to show a tray icon, minimizing then hides
+        # the window to the tray. Otherwise the window minimizes and closes
+        # as usual.
+        if os.getenv("STANDUP_TRAY", "0") == "1" and qw.QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray = SessionTrayIcon(self)
+            self.tray.show()
+            # Closing a reminder popup while the window is in the tray
+            # must not quit
+            qw.QApplication.setQuitOnLastWindowClosed(False)
+
+        QtCore.QTimer.singleShot(0, self.offerResume)
+
     def init_ui(self):
         self.screen_stack = qw.QStackedWidget(self)
 
@@ -627,7 +1059,10 @@ class StandUpWindow(qw.QMainWindow):
         self.transition_layout = qw.QVBoxLayout(self.transition_screen)
 
         # Set up start screen
-        self.profile_select = ProfileSelect()
+        self.profile_writer = ProfileWriter(get_profile_store(), self)
+        self.profile_writer.failed.connect(self.profileWriteFailed)
+
+        self.profile_select = ProfileSelect(self.profile_writer)
         self.profile_select.profileChanged.connect(self.loadProfile)
         self.profile_select.createProfile.connect(self.saveProfile)
         self.profile_select.updateProfile.connect(self.saveProfile)
@@ -671,17 +1106,103 @@ class StandUpWindow(qw.QMainWindow):
         self.setCentralWidget(self.screen_stack)
 
     def loadProfile(self, profile_name):
-        profile = load_profile(profile_name)
+        profile = self.profile_writer.load(profile_name)
         self.session_options.putData(profile)
 
     def saveProfile(self, profile_name):
         profile = self.session_options.serializeData()
-        save_profile(profile_name, profile)
+        self.profile_writer.save(profile_name, profile)
 
     def deleteProfile(self, profile_name):
-        delete_profile(profile_name)
+        self.profile_writer.delete(profile_name)
+
+    def profileWriteFailed(self, profile_names, error):
+        qw.QMessageBox.warning(
+            self,
+            "Stand Up",
+            f"Could not save changes to {', '.join(profile_names)}:\n{error}",
+        )
+
+    def closeEvent(self, close_event):
+        self.profile_writer.waitForWrites()
+        # A session that is still running can be resumed on the next launch
+        self.saveCheckpoint()
+        self.checkpoint.close()
+        super().closeEvent(close_event)
+        if self.tray is not None:
+            self.tray.hide()
+            qw.QApplication.quit()
+
+    def changeEvent(self, change_event):
+        super().changeEvent(change_event)
+        if self.tray is None:
+            return
+        if change_event.type() == QtCore.QEvent.WindowStateChange and self.isMinimized():
+            # Hiding from inside the state change does not always stick
+            QtCore.QTimer.singleShot(0, self.hide)
+        elif change_event.type() == QtCore.QEvent.PaletteChange:
+            self.tray.paletteChanged()
+
+    def sessionElapsed(self):
+        """
+        Seconds into the session as counted by the session queue.
+        """
+        if self.screen_stack.currentWidget() is self.timer_screen:
+            return self.interval_start + self.timer_widget.elapsed()
+        return self.interval_start + self.interval_duration
+
+    def saveCheckpoint(self, elapsed=None):
+        if self.session_queue is None or self.interval_duration is None:
+            return
+        if elapsed is None:
+            elapsed = self.sessionElapsed()
+        self.checkpoint.update(elapsed, self.timer_widget.countdown.paused)
+
+    def offerResume(self):
+        try:
+            state = self.checkpoint.load()
+        except (OSError, ValueError):
+            state = None
+        if state is None:
+            return
+        definition, elapsed, paused, updated = state
+        minutes_ago = max(0, int(QtCore.QDateTime.currentSecsSinceEpoch() - updated)) // 60
+        answer = qw.QMessageBox.question(
+            self,
+            "Stand Up",
+            f"A session was still running {minutes_ago} min ago, "
+            f"{elapsed // 60} min in. Resume it?",
+        )
+        if answer == qw.QMessageBox.Yes:
+            self.resume_session(definition, elapsed, paused)
+        else:
+            self.checkpoint.clear()
+
+    def resume_session(self, definition, elapsed, paused=False):
+        self.session_options.putData(definition)
+        try:
+            self.session_queue = self.session_options.get_session_queue()
+        except ValueError:
+            self.checkpoint.clear()
+            return
+        offset = self.session_queue.seek(elapsed)
+        if offset is None:
+            self.checkpoint.clear()
+            return
+        self.checkpoint.start(definition)
+        self.checkpoint_timer.start()
+        self.run_next_interval(offset)
+        if paused:
+            self.timer_widget.togglePause()
+        self.saveCheckpoint()
 
     def start_next_interval(self):
+        self.run_next_interval()
+
+    def run_next_interval(self, elapsed=0):
+        """
+        Starts the next interval of the session, elapsed seconds into it.
+        """
         (
             self.is_break,
             self.interval_duration,
@@ -691,16 +1212,24 @@ class StandUpWindow(qw.QMainWindow):
         if self.is_break is None and self.interval_duration is None:
             self.finish_session()
         else:
+            self.interval_start = (
+                self.session_queue.total_length
+                - self.session_queue.session_remaining
+                - self.interval_duration
+            )
             if self.is_break:
                 self.setWindowTitle(self.window_title + " - Break")
             else:
                 self.setWindowTitle(self.window_title + " - Focus")
 
             self.screen_stack.setCurrentWidget(self.timer_screen)
-            self.timer_widget.startNewCountdown(self.interval_duration)
+            self.timer_widget.startNewCountdown(self.interval_duration, elapsed)
+            self.saveCheckpoint()
 
     def interval_ended(self, timer_finished):
         if timer_finished:
+            # The session continues with the next interval from here
+            self.saveCheckpoint(self.interval_start + self.interval_duration)
             if self.reminder:
                 self.transition_message.setText(self.reminder.message)
                 start_next = self.reminder.trigger()
@@ -708,6 +1237,9 @@ class StandUpWindow(qw.QMainWindow):
                     self.start_next_interval()
                 else:
                     self.screen_stack.setCurrentWidget(self.transition_screen)
+                    if self.tray is not None and not self.isVisible():
+                        # Waiting for Next Interval to be clicked
+                        self.tray.toggleWindow()
             else:
                 self.start_next_interval()
         else:
@@ -715,12 +1247,23 @@ class StandUpWindow(qw.QMainWindow):
 
     @QtCore.Slot()
     def start_session(self):
-        self.session_queue = self.session_options.get_session_queue()
+        try:
+            self.session_queue = self.session_options.get_session_queue()
+        except ValueError as error:
+            qw.QMessageBox.warning(self, "Stand Up", f"The pattern is not valid:\n{error}")
+            return
+        self.checkpoint.start(self.session_options.serializeData())
+        self.checkpoint_timer.start()
         self.start_next_interval()
 
     def finish_session(self):
+        self.checkpoint_timer.stop()
+        self.checkpoint.clear()
+        self.session_queue = None
         self.setWindowTitle(self.window_title)
         self.screen_stack.setCurrentWidget(self.start_screen)
+        if self.tray is not None:
+            self.tray.updateProgress()
 
 
 def main():
@@ -0,0 +1,163 @@
+"""
+    System tray icon for Stand Up.
+
+    The icon is a small progress ring of the running interval. Drawing it
+    every second would wake the app up as often as the window it stands
+    in for, so the icons are drawn once up front: ProgressIconAtlas
+    renders every step of the ring with QProgressRing's own drawing code,
+    and is only drawn again when the palette or the pixel density changes.
+    SessionTrayIcon swaps to the next icon when the countdown reaches the
+    next step and sleeps until then, which with the default 32 steps is
+    32 wakeups in a whole interval.
+"""
+from PySide6 import QtCore, QtGui
+from PySide6 import QtWidgets as qw
+
+from standup.QProgressRing import QProgressRing
+from standup.clock import NS_PER_SECOND
+
+
+class ProgressIconAtlas:
+    """
+    Icons of a progress ring at steps + 1 states, from empty (0) to full
+    (steps), size by size pixels before scaling for the screen.
+    """
+
+    def __init__(self, steps=32, size=64):
+        self.steps = steps
+        self.size = size
+        self._icons = []
+        self._key = None
+
+    def icon(self, step):
+        """
+        Icon of the ring step steps of the way round, drawing the atlas
+        first if the palette or pixel density changed since it was drawn.
+        """
+        key = (
+            QtGui.QGuiApplication.palette().cacheKey(),
+            QtGui.QGuiApplication.primaryScreen().devicePixelRatio(),
+        )
+        if key != self._key:
+            self._icons = self.render()
+            self._key = key
+        return self._icons[step]
+
+    def render(self):
+        ring = QProgressRing()
+        ring.resize(self.size, self.size)
+        # Not shown, so the ring gets no resize event
+        ring.calcRadius(ring.size())
+        ring.calcSquare(ring.rect().center())
+        ring.setMaximum(self.steps)
+        dpr = ring.devicePixelRatioF()
+        icons = []
+        for step in range(self.steps + 1):
+            ring.setValue(step)
+            pixmap = QtGui.QPixmap(round(self.size * dpr), round(self.size * dpr))
+            pixmap.setDevicePixelRatio(dpr)
+            pixmap.fill(QtCore.Qt.transparent)
+            qp = QtGui.QPainter(pixmap)
+            # Text is unreadable at icon sizes
+            ring.drawRing(qp, text=False)
+            qp.end()
+            icons.append(QtGui.QIcon(pixmap))
+        return icons
+
+
+class SessionTrayIcon(qw.QSystemTrayIcon):
+    """
+    Tray icon of a StandUpWindow. Clicking it shows or hides the window,
+    its menu pauses, stops and finishes the interval.
+    self.icon_swaps counts how often the icon was changed.
+    """
+
+    def __init__(self, main_window, atlas=None):
+        super().__init__(main_window)
+        self.main_window = main_window
+        self.timer_widget = main_window.timer_widget
+        self.atlas = atlas if atlas is not None else ProgressIconAtlas()
+        self.step = None
+        self.next_step_call = None
+        self.icon_swaps = 0
+
+        self.menu = qw.QMenu()
+        self.show_action = self.menu.addAction("Show Stand Up")
+        self.show_action.triggered.connect(self.toggleWindow)
+        self.menu.addSeparator()
+        self.pause_action = self.menu.addAction("Pause")
+        self.pause_action.triggered.connect(self.timer_widget.togglePause)
+        self.stop_action = self.menu.addAction("Stop")
+        self.stop_action.triggered.connect(self.timer_widget.stopTimer)
+        self.finish_action = self.menu.addAction("Finish")
+        self.finish_action.triggered.connect(self.timer_widget.timerFinished)
+        self.menu.addSeparator()
+        self.quit_action = self.menu.addAction("Quit")
+        self.quit_action.triggered.connect(self.main_window.close)
+        self.menu.aboutToShow.connect(self.updateMenu)
+        self.setContextMenu(self.menu)
+
+        self.activated.connect(self.iconActivated)
+        self.timer_widget.stateChanged.connect(self.updateProgress)
+        self.updateProgress()
+
+    def running(self):
+        return self.main_window.session_queue is not None and bool(self.timer_widget.countdown.duration)
+
+    def updateMenu(self):
+        running = self.running()
+        for action in (self.pause_action, self.stop_action, self.finish_action):
+            action.setEnabled(running)
+        self.pause_action.setText("Unpause" if self.timer_widget.countdown.paused else "Pause")
+        self.show_action.setText("Hide Stand Up" if self.main_window.isVisible() else "Show Stand Up")
+
+    def iconActivated(self, reason):
+        if reason == qw.QSystemTrayIcon.Trigger:
+            self.toggleWindow()
+
+    def toggleWindow(self):
+        if self.main_window.isVisible():
+            self.main_window.hide()
+        else:
+            self.main_window.showNormal()
+            self.main_window.raise_()
+            self.main_window.activateWindow()
+
+    def updateProgress(self):
+        """
+        Shows the step the countdown is at and sleeps until the next one.
+        """
+        if self.next_step_call is not None:
+            self.next_step_call.cancel()
+            self.next_step_call = None
+        countdown = self.timer_widget.countdown
+        step = 0
+        if self.running():
+            total = countdown.duration * NS_PER_SECOND
+            step = min(self.atlas.steps, (total - countdown.time_left()) * self.atlas.steps // total)
+            if not countdown.paused and step < self.atlas.steps:
+                # When the time left drops to where step + 1 starts
+                next_step = countdown.deadline - total + -(-total * (step + 1) // self.atlas.steps)
+                self.next_step_call = self.timer_widget.clock.call_at(next_step, self.nextStepDue)
+        self.setStep(step)
+
+    def nextStepDue(self):
+        self.next_step_call = None
+        self.updateProgress()
+
+    def setStep(self, step):
+        if step == self.step:
+            return
+        self.step = step
+        self.setIcon(self.atlas.icon(step))
+        self.icon_swaps += 1
+        tooltip = self.main_window.windowTitle()
+        if self.running():
+            minutes_left = -(-self.timer_widget.countdown.time_left() // (60 * NS_PER_SECOND))
+            tooltip += f" ({minutes_left} min left)"
+        self.setToolTip(tooltip)
+
+    def paletteChanged(self):
+        # The atlas notices the new palette itself
+        self.step = None
+        self.updateProgress()